@@ -1,28 +1,129 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from tracer import trace_code
-import traceback
+from cache import TraceCache, cache_key, is_deterministic
+from engines import available_engines
+from selection import Selection
+from executor import PoolSaturated, TracePool, collect
+from empirical import estimate
+from compact import MIN_COMPRESS_BYTES, collect_compact, compress, pick_encoding
+import os, tempfile, threading
 
 app = Flask(__name__)
 CORS(app)  # allow requests from frontend
 
+# per-request budgets; a trace that hits one ends with a truncation marker
+MAX_FRAMES = int(os.environ.get("TRACE_MAX_FRAMES", 5000))
+MAX_BYTES  = int(os.environ.get("TRACE_MAX_BYTES", 16 * 1024 * 1024))
+MAX_STEPS  = int(os.environ.get("TRACE_MAX_STEPS", 1_000_000))
+# per input size when measuring complexity empirically
+MEASURE_LIMIT = float(os.environ.get("TRACE_MEASURE_LIMIT", 1.0))
+
+# user code runs in these worker processes, never in the request thread.
+# Built lazily: worker start-up re-imports the main module, so creating the
+# pool at import time would recurse when this file is run directly.
+_pool, _pool_lock = None, threading.Lock()
+
+def get_pool() -> TracePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TracePool(
+                workers=int(os.environ.get("TRACE_WORKERS", 0)) or None,
+                max_queue=int(os.environ.get("TRACE_QUEUE", 16)),
+                timeout=float(os.environ.get("TRACE_TIMEOUT", 5)),
+                mem_limit=int(os.environ.get("TRACE_MEM_MB", 512)) * 1024 * 1024,
+            )
+        return _pool
+
+# finished traces of deterministic programs, keyed on source + tracer version
+cache = TraceCache(
+    max_bytes=int(os.environ.get("TRACE_CACHE_MB", 64)) * 1024 * 1024,
+    directory=os.environ.get("TRACE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "traceds-cache")) or None,
+)
+
+@app.route("/stats")
+def stats():
+    pool = get_pool()
+    return jsonify({"cache": cache.stats,
+                    "pool": {"workers": pool.size, "respawns": pool.respawns}})
+
 @app.route("/trace", methods=["GET", "POST"])
 def trace():
     if request.method == "GET":
         return "OK", 200  # health check response (for rendering)
 
     code = request.json.get("code", "")
+    engine = request.json.get("engine", "ast")
+    if engine not in available_engines():
+        return jsonify({"error": f"Unknown or unavailable engine: {engine}"}), 400
+    try:
+        # watch list, line/function scope, granularity and sampling
+        select = Selection.from_dict(request.json).to_dict()
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    # "json" (frame list) or "compact" (columnar, see compact.py)
+    fmt = request.json.get("format", "json")
+    if fmt not in ("json", "compact"):
+        return jsonify({"error": f"Unknown format: {fmt}"}), 400
+    opts = {"max_frames": MAX_FRAMES, "max_bytes": MAX_BYTES, "max_steps": MAX_STEPS,
+            "engine": engine, "select": select}
+    # streamed traces may send list / dict locals as per-step ops
+    stream = bool(request.json.get("stream"))
+    if stream and request.json.get("deltas"): opts["deltas"] = True
+    # per-phase timings describe this run, so they are never served from cache
+    timings = bool(request.json.get("timings"))
+    if timings: opts["timings"] = True
+    run = lambda: get_pool().submit(code, opts)
+    try:
+        # cache hits never touch the pool (and so are never refused)
+        cacheable = is_deterministic(code) and not timings
+        job = cache.open(cache_key(code, opts), run) if cacheable else run()
+    except PoolSaturated:
+        return jsonify({"error": "Server busy, try again shortly"}), 429, {"Retry-After": "1"}
+
+    if stream:
+        # NDJSON: one event per line, sent while the program is still running
+        return Response(job, mimetype="application/x-ndjson",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    try:
+        body, error = (collect_compact if fmt == "compact" else collect)(job)
+    finally:
+        job.close()
+    if error:
+        return jsonify(error), 400
+    return compressed(body.encode(), "application/json")
+
+@app.route("/complexity", methods=["POST"])
+def complexity():
+    # run one function at growing input sizes and fit the measured costs
+    data = request.json
     try:
-        result = trace_code(code)
-        return jsonify(result)
-    except Exception as e:
-        traceback.print_exc()
+        result = estimate(get_pool().submit, data.get("code", ""), function=data.get("function"),
+                          input=data.get("input"), sizes=data.get("sizes"),
+                          time_limit=MEASURE_LIMIT)
+    except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    except PoolSaturated:
+        return jsonify({"error": "Server busy, try again shortly"}), 429, {"Retry-After": "1"}
+    return jsonify(result), 400 if "error" in result else 200
 
+def compressed(data: bytes, mimetype: str) -> Response:
+    """Response compressed with the best encoding the client accepts."""
+    encoding = pick_encoding(request.accept_encodings) if len(data) >= MIN_COMPRESS_BYTES else None
+    resp = Response(compress(data, encoding) if encoding else data, mimetype=mimetype)
+    if encoding: resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    return resp
 
 
-import os
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))  # default if not set
-    app.run(host="0.0.0.0", port=port, debug=True)
+    debug = True
+    # pre-warm the workers before the first request.  With the reloader
+    # (debug) this file runs in a watcher process that never serves and again
+    # in the child that does, marked by WERKZEUG_RUN_MAIN; only the child
+    # needs a pool
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        get_pool()
+    app.run(host="0.0.0.0", port=port, debug=debug)
@@ -0,0 +1,303 @@
+# bench.py — TraceDS tracer benchmarks
+#
+#   python bench.py                      run the corpus, print a table
+#   python bench.py --save               also store the results as the baseline
+#   python bench.py --compare            diff against the stored baseline
+#   python bench.py --engine monitoring  same corpus through another engine
+#
+# Every program is traced in-process at several input sizes through
+# `iter_trace(encode=True)` — the same path the workers use — measuring wall
+# time, frames per second, encoded response bytes and (second pass, with
+# tracemalloc) peak traced memory.
+#
+# `--compare` fails on frame or byte growth, which do not depend on the
+# machine.  Wall times are shown relative to a calibration loop timed on the
+# same machine as the results, and only fail with `--time-threshold`.
+
+import argparse, json, os, sys, time, tracemalloc
+
+from tracer import iter_trace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+# ───────────────────────────────────────────────────────────
+#  corpus — each entry formats `{n}` into its source
+# ───────────────────────────────────────────────────────────
+CORPUS = {
+    "bubble_sort": """
+def bubble_sort(arr):
+    n = len(arr)
+    for i in range(n):
+        for j in range(0, n-i-1):
+            if arr[j] > arr[j+1]:
+                arr[j], arr[j+1] = arr[j+1], arr[j]
+
+arr = [(i * 7919) % {n} for i in range({n})]
+bubble_sort(arr)
+""",
+    "merge_sort": """
+def merge_sort(arr):
+    if len(arr) <= 1:
+        return arr
+    mid = len(arr) // 2
+    left = merge_sort(arr[:mid])
+    right = merge_sort(arr[mid:])
+    return merge(left, right)
+
+def merge(left, right):
+    result = []; i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            result.append(left[i]); i += 1
+        else:
+            result.append(right[j]); j += 1
+    result.extend(left[i:]); result.extend(right[j:])
+    return result
+
+arr = [(i * 7919) % {n} for i in range({n})]
+arr = merge_sort(arr)
+""",
+    "quick_sort": """
+def quicksort(arr):
+    if len(arr) <= 1:
+        return arr
+    pivot = arr[0]
+    left  = [x for x in arr[1:] if x <  pivot]
+    right = [x for x in arr[1:] if x >= pivot]
+    return quicksort(left) + [pivot] + quicksort(right)
+
+arr = [(i * 7919) % {n} for i in range({n})]
+arr = quicksort(arr)
+""",
+    "bst_insert": """
+class TreeNode:
+    def __init__(self, v):
+        self.val = v
+        self.left = self.right = None
+
+def insert(root, x):
+    if not root:
+        return TreeNode(x)
+    if x < root.val:
+        root.left  = insert(root.left,  x)
+    else:
+        root.right = insert(root.right, x)
+    return root
+
+root = None
+for v in [(i * 7919) % {n} for i in range({n})]:
+    root = insert(root, v)
+""",
+    "avl_insert": """
+class AVLNode:
+    def __init__(self, v):
+        self.val = v
+        self.left = self.right = None
+        self.height = 1
+
+def h(n): return n.height if n else 0
+def bf(n): return h(n.left) - h(n.right) if n else 0
+
+def rot_right(y):
+    x, T2 = y.left, y.left.right
+    x.right, y.left = y, T2
+    y.height = 1 + max(h(y.left), h(y.right))
+    x.height = 1 + max(h(x.left), h(x.right))
+    return x
+
+def rot_left(x):
+    y, T2 = x.right, x.right.left
+    y.left, x.right = x, T2
+    x.height = 1 + max(h(x.left), h(x.right))
+    y.height = 1 + max(h(y.left), h(y.right))
+    return y
+
+def insert(node, key):
+    if not node:
+        return AVLNode(key)
+    if key < node.val:
+        node.left  = insert(node.left,  key)
+    else:
+        node.right = insert(node.right, key)
+    node.height = 1 + max(h(node.left), h(node.right))
+    balance = bf(node)
+    if balance > 1 and key < node.left.val:
+        return rot_right(node)
+    if balance < -1 and key > node.right.val:
+        return rot_left(node)
+    if balance > 1 and key > node.left.val:
+        node.left = rot_left(node.left); return rot_right(node)
+    if balance < -1 and key < node.right.val:
+        node.right = rot_right(node.right); return rot_left(node)
+    return node
+
+root = None
+for v in range({n}):
+    root = insert(root, v)
+""",
+    "linked_reverse": """
+class Node:
+    def __init__(self, val):
+        self.val = val
+        self.next = None
+
+head = None
+for v in range({n}):
+    node = Node(v)
+    node.next = head
+    head = node
+
+prev, cur = None, head
+while cur:
+    nxt = cur.next
+    cur.next = prev
+    prev, cur = cur, nxt
+head = prev
+""",
+    "hash_map": """
+words = [("w" + str((i * 31) % ({n} // 3 + 1))) for i in range({n})]
+counts = {{}}
+for w in words:
+    counts[w] = counts.get(w, 0) + 1
+for w in list(counts):
+    if counts[w] < 3:
+        del counts[w]
+""",
+    "deep_recursion": """
+def total(n):
+    if n == 0:
+        return 0
+    return n + total(n - 1)
+
+result = total({n})
+""",
+}
+
+SIZES = {"quick": (10, 50), "full": (10, 50, 200)}
+# quadratic programs are kept small so the suite stays fast
+SIZE_CAP = {"bubble_sort": 50, "deep_recursion": 400}
+
+
+# ───────────────────────────────────────────────────────────
+#  measurement
+# ───────────────────────────────────────────────────────────
+def run_once(code, engine, memory=False):
+    if memory: tracemalloc.start()
+    frames, nbytes, error = 0, 0, None
+    t = time.perf_counter()
+    for line in iter_trace(code, encode=True, engine=engine, max_frames=1_000_000):
+        nbytes += len(line.encode())
+        if line.startswith('{"frame":'): frames += 1
+        elif line.startswith('{"error":'): error = json.loads(line)["error"]
+    wall = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1] if memory else None
+    if memory: tracemalloc.stop()
+    return wall, frames, nbytes, peak, error
+
+def calibrate(repeat=5) -> float:
+    """Best-of-N milliseconds for a fixed pure-Python workload, so wall times
+    from different machines can be compared as multiples of it."""
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        d, out = {}, []
+        for i in range(200_000):
+            d[i % 1000] = d.get(i % 1000, 0) + i
+            if i % 7 == 0: out.append(str(i))
+        best = min(best or 1e9, time.perf_counter() - t)
+    return round(best * 1000, 2)
+
+def bench(sizes, engine, repeat, memory):
+    results = {}
+    for name, template in CORPUS.items():
+        for n in sizes:
+            if n > SIZE_CAP.get(name, n): continue
+            code = template.format(n=n)
+            walls, frames, nbytes = [], 0, 0
+            for _ in range(repeat):
+                wall, frames, nbytes, _, error = run_once(code, engine)
+                if error: raise SystemExit(f"{name}[{n}] failed: {error}")
+                walls.append(wall)
+            wall = min(walls)
+            results[f"{name}[{n}]"] = {
+                "wall_ms": round(wall * 1000, 2),
+                "frames": frames,
+                "frames_per_s": round(frames / wall) if wall else None,
+                "bytes": nbytes,
+                "peak_kb": round(run_once(code, engine, memory=True)[3] / 1024) if memory else None,
+            }
+    return results
+
+
+# ───────────────────────────────────────────────────────────
+#  reporting
+# ───────────────────────────────────────────────────────────
+GATED = ("frames", "bytes")        # machine-independent: fail --compare on growth
+
+def print_table(results, baseline=None, threshold=0.10, time_scale=None, time_threshold=None):
+    """Print the results; with a baseline, return the regressions.
+
+    `time_scale` is this machine's calibration time over the baseline's, so
+    wall times are compared as if run on the baseline machine (None: raw).
+    """
+    cols = ("wall_ms", "frames", "frames_per_s", "bytes", "peak_kb")
+    print(f"{'case':<22}" + "".join(f"{c:>14}" for c in cols) + ("   vs baseline" if baseline else ""))
+    regressions = []
+    for case, r in results.items():
+        row = f"{case:<22}" + "".join(f"{'-' if r[c] is None else r[c]:>14}" for c in cols)
+        base = (baseline or {}).get(case)
+        if base:
+            notes = []
+            for c in ("wall_ms", "frames", "bytes", "peak_kb"):
+                if r[c] is None or not base.get(c): continue
+                cur = r[c] / time_scale if c == "wall_ms" and time_scale else r[c]
+                delta = cur / base[c] - 1
+                notes.append(f"{c.split('_')[0]} {delta:+.0%}")
+                limit = threshold if c in GATED else time_threshold if c == "wall_ms" else None
+                if limit is not None and delta > limit:
+                    regressions.append(f"{case} {c} {delta:+.0%}")
+            row += "   " + ", ".join(notes)
+        print(row)
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--engine", default="ast")
+    ap.add_argument("--sizes", choices=sorted(SIZES), default="full")
+    ap.add_argument("--repeat", type=int, default=3, help="best-of-N wall time")
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="store results as the baseline")
+    ap.add_argument("--compare", action="store_true", help="compare with the baseline")
+    ap.add_argument("--threshold", type=float, default=0.10,
+                    help="regression threshold for frames and bytes")
+    ap.add_argument("--time-threshold", type=float, default=None,
+                    help="also fail on calibrated wall-time growth over this")
+    args = ap.parse_args(argv)
+
+    calibration = calibrate()
+    results = bench(SIZES[args.sizes], args.engine, args.repeat, not args.no_memory)
+    baseline, time_scale = None, None
+    if args.compare:
+        with open(args.baseline) as fh: stored = json.load(fh)
+        baseline = stored["results"]
+        if stored.get("calibration_ms"):
+            time_scale = calibration / stored["calibration_ms"]
+            print(f"calibration {calibration} ms (baseline {stored['calibration_ms']} ms): "
+                  f"wall times scaled by {1 / time_scale:.2f}")
+        else:
+            print("baseline has no calibration: wall times are compared raw")
+    regressions = print_table(results, baseline, args.threshold, time_scale, args.time_threshold)
+    if args.save:
+        with open(args.baseline, "w") as fh:
+            json.dump({"python": sys.version.split()[0], "engine": args.engine,
+                       "calibration_ms": calibration, "results": results}, fh, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    if regressions:
+        print("\nregressions over threshold:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# cache.py — TraceDS content-addressed trace cache
+#
+# A trace is a pure function of (source, tracer version, budgets) as long as
+# the program itself is deterministic, so finished NDJSON traces are kept in
+# a byte-bounded in-memory LRU with a zlib-compressed on-disk tier behind it.
+# Identical requests that arrive while the first one is still running wait
+# for it instead of running the program again (single flight).
+
+import ast, hashlib, json, os, threading, zlib
+from collections import OrderedDict
+
+from tracer import TRACER_VERSION
+
+# anything that can make two runs of the same source differ
+_NONDETERMINISTIC_MODULES = {"random", "time", "datetime", "uuid", "secrets",
+                             "os", "sys", "threading", "socket", "urllib"}
+_NONDETERMINISTIC_CALLS   = {"input", "open", "id", "hash", "set", "frozenset"}
+
+
+def normalize_source(code: str) -> str:
+    """Drop differences that cannot change a trace (line numbers are kept)."""
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(l.rstrip() for l in lines).rstrip("\n") + "\n"
+
+def cache_key(code: str, opts: dict = None) -> str:
+    h = hashlib.sha256()
+    h.update(TRACER_VERSION.encode()); h.update(b"\0")
+    h.update(json.dumps(opts or {}, sort_keys=True).encode()); h.update(b"\0")
+    h.update(normalize_source(code).encode())
+    return h.hexdigest()
+
+def is_deterministic(code: str) -> bool:
+    """Conservative check: imports/calls that may vary between runs, and sets
+    (string and object hashes differ per process) disqualify a program."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True                         # the error itself is deterministic
+    for n in ast.walk(tree):
+        if isinstance(n, ast.Import):
+            if any(a.name.split(".")[0] in _NONDETERMINISTIC_MODULES for a in n.names): return False
+        elif isinstance(n, ast.ImportFrom):
+            if (n.module or "").split(".")[0] in _NONDETERMINISTIC_MODULES: return False
+        elif isinstance(n, ast.Call) and isinstance(n.func, ast.Name):
+            if n.func.id in _NONDETERMINISTIC_CALLS: return False
+        elif isinstance(n, (ast.Set, ast.SetComp)):
+            return False
+    return True
+
+def _cacheable(lines) -> bool:
+    # finished traces and user-code errors repeat; pool limits (timeout,
+    # crashed worker) depend on load and are never stored
+    if not lines: return False
+    last = json.loads(lines[-1])
+    return "done" in last or ("error" in last and "limit" not in last)
+
+
+class _Flight:
+    def __init__(self):
+        self.done, self.lines = threading.Event(), None
+
+
+class TraceCache:
+    """Byte-bounded LRU of NDJSON traces backed by a compressed directory.
+
+    `open(key, produce)` returns an iterable of trace lines: a replay on a
+    hit, otherwise `produce()`'s lines teed into the cache.  `stats` counts
+    hits (memory / disk), misses, coalesced waits and evictions.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, directory: str = None,
+                 disk_max_bytes: int = 512 * 1024 * 1024, wait_timeout: float = 30.0):
+        self.max_bytes, self.directory = max_bytes, directory
+        self.disk_max_bytes, self.wait_timeout = disk_max_bytes, wait_timeout
+        self._mem, self._mem_bytes = OrderedDict(), 0
+        self._lock, self._inflight = threading.Lock(), {}
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0,
+                      "coalesced": 0, "evictions": 0, "disk_evictions": 0}
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(e[1] for e in self._disk_entries())
+
+    # ── tiers ─────────────────────────────────────────────
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".ndjson.z")
+
+    def get(self, key: str):
+        with self._lock:
+            lines = self._mem.get(key)
+            if lines is not None:
+                self._mem.move_to_end(key)
+                self.stats["hits"] += 1
+                return lines
+        if self.directory:
+            try:
+                with open(self._path(key), "rb") as fh:
+                    lines = tuple(zlib.decompress(fh.read()).decode().splitlines(True))
+            except (OSError, zlib.error):
+                lines = None
+            if lines is not None:
+                self._remember(key, lines)
+                with self._lock: self.stats["disk_hits"] += 1
+                return lines
+        return None
+
+    def put(self, key: str, lines):
+        lines = tuple(lines)
+        self._remember(key, lines)
+        if self.directory:
+            blob = zlib.compress("".join(lines).encode(), 6)
+            tmp = self._path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as fh: fh.write(blob)
+                os.replace(tmp, self._path(key))
+            except OSError:
+                return
+            with self._lock:
+                self._disk_bytes += len(blob)
+                over = self._disk_bytes > self.disk_max_bytes
+            if over: self._prune_disk()
+
+    def _remember(self, key, lines):
+        size = sum(len(l) for l in lines)
+        if size > self.max_bytes: return
+        with self._lock:
+            if key in self._mem: return
+            self._mem[key] = lines; self._mem_bytes += size
+            while self._mem_bytes > self.max_bytes:
+                _, old = self._mem.popitem(last=False)
+                self._mem_bytes -= sum(len(l) for l in old)
+                self.stats["evictions"] += 1
+
+    def _disk_entries(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith(".ndjson.z"): continue
+            try: st = os.stat(os.path.join(self.directory, name))
+            except OSError: continue
+            yield st.st_mtime, st.st_size, name
+
+    def _prune_disk(self):
+        # oldest first, down to 90% so we do not rescan on every write
+        entries = sorted(self._disk_entries())
+        total = sum(e[1] for e in entries)
+        for _, size, name in entries:
+            if total <= self.disk_max_bytes * 0.9: break
+            try: os.remove(os.path.join(self.directory, name))
+            except OSError: continue
+            total -= size
+            with self._lock: self.stats["disk_evictions"] += 1
+        with self._lock: self._disk_bytes = total
+
+    # ── single flight ─────────────────────────────────────
+    def open(self, key: str, produce):
+        """Iterable of trace lines for `key`; `produce()` runs only on a miss.
+
+        Followers of an identical in-flight request wait here for its lines
+        (cached or not).  Exceptions from `produce()` (e.g. a saturated pool)
+        always propagate from this call, before any line is sent.
+        """
+        while True:
+            lines = self.get(key)
+            if lines is not None: return (l for l in lines)
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader: flight = self._inflight[key] = _Flight()
+                self.stats["misses" if leader else "coalesced"] += 1
+            if leader: break
+            if not flight.done.wait(self.wait_timeout):
+                return produce()            # leader is stuck — run it ourselves
+            if flight.lines is not None: return (l for l in flight.lines)
+            # the leader was cancelled before finishing: go round again, so
+            # one of the waiting requests leads and the rest follow it
+        try:
+            source = produce()
+        except BaseException:
+            self._land(key, flight, None); raise
+        return _Relay(self, key, flight, source)
+
+    def _land(self, key, flight, lines):
+        # followers share a finished run even if it is not cacheable (e.g. a
+        # timeout); `None` means the leader never finished
+        if lines is not None and _cacheable(lines):
+            self.put(key, lines)
+        with self._lock: self._inflight.pop(key, None)
+        flight.lines = tuple(lines) if lines is not None else None
+        flight.done.set()
+
+
+class _Relay:
+    """Passes the leader's lines through while recording them for the cache."""
+
+    def __init__(self, cache, key, flight, source):
+        self._cache, self._key, self._flight = cache, key, flight
+        self._source, self._it, self._lines = source, None, []
+        self._landed = False
+
+    def __iter__(self):
+        self._it = iter(self._source)
+        return self
+
+    def __next__(self):
+        try:
+            line = next(self._it)
+        except StopIteration:
+            self._finish(self._lines); raise
+        self._lines.append(line)
+        return line
+
+    def _finish(self, lines):
+        if self._landed: return
+        self._landed = True
+        self._cache._land(self._key, self._flight, lines)
+
+    def close(self):
+        if hasattr(self._source, "close"): self._source.close()
+        self._finish(None)                  # no-op if we ran to the end
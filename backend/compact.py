@@ -0,0 +1,112 @@
+# compact.py — TraceDS columnar trace encoding and response compression
+#
+# The classic `/trace` body repeats every variable in every frame.  The
+# compact body (`"format": "compact"`) stores the trace by column instead:
+#
+#   line_no   base64 little-endian int32 array, one entry per frame
+#   values    intern table — every distinct value (string, number, list,
+#             dict, …) is stored once and referred to by index
+#   columns   {"lists": {"arr": [gap, value, gap, value, …]}, …}: a
+#             run-length timeline per variable, one pair per change, where
+#             `gap` counts frames since the previous change (the first one is
+#             the starting frame) and `value` is -1 while the variable is absent
+#   heap      [[frame, {id: record}], …] for the frames that carry heap records
+#
+# plus the usual `complexity` / `truncated` / `timings`.  frontend/src/
+# traceCodec.js turns it back into the per-frame objects the visualizers use.
+
+import base64, gzip, json, sys
+from array import array
+
+try:
+    import brotli
+except ImportError:         # optional: gzip is always available
+    brotli = None
+
+FORMAT_VERSION = 1
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+MIN_COMPRESS_BYTES = 1024   # smaller bodies are not worth a compressor
+
+
+def _value_key(v) -> str:
+    # key order is part of the value (dict display order), so no sort_keys
+    return json.dumps(v, separators=(",", ":"), default=repr)
+
+
+class ColumnarEncoder:
+    """Feed frames in order with `add(frame)`, then `payload(**tail)`."""
+
+    def __init__(self):
+        self.lines = array("i")
+        self.values, self._index = [], {}
+        self.columns, self._last = {}, {}      # col → name → runs / (value, frame)
+        self.heap = []
+
+    def _intern(self, v) -> int:
+        key = _value_key(v)
+        i = self._index.get(key)
+        if i is None:
+            i = self._index[key] = len(self.values)
+            self.values.append(v)
+        return i
+
+    def add(self, frame: dict):
+        i = len(self.lines)
+        self.lines.append(frame["line_no"])
+        if frame.get("heap"): self.heap.append([i, frame["heap"]])
+        for col, vars_ in frame.items():
+            if col in ("line_no", "heap"): continue
+            self.columns.setdefault(col, {}); last = self._last.setdefault(col, {})
+            for name, v in vars_.items():
+                vi = self._intern(v)
+                if last.get(name, (None,))[0] != vi: self._change(col, name, i, vi)
+        for col, last in self._last.items():
+            vars_ = frame.get(col) or {}
+            for name, (vi, _) in list(last.items()):
+                if vi != -1 and name not in vars_: self._change(col, name, i, -1)
+
+    def _change(self, col, name, i, vi):
+        runs = self.columns[col].setdefault(name, [])
+        prev = self._last[col].get(name)
+        # small repeating gaps compress far better than growing frame numbers
+        runs.extend((i - prev[1] if prev else i, vi))
+        self._last[col][name] = (vi, i)
+
+    def payload(self, **tail) -> dict:
+        lines = array("i", self.lines)
+        if sys.byteorder == "big": lines.byteswap()
+        return {"format": "columnar", "version": FORMAT_VERSION, "length": len(lines),
+                "line_no": base64.b64encode(lines.tobytes()).decode(), "values": self.values,
+                "columns": self.columns, "heap": self.heap,
+                **{k: v for k, v in tail.items() if v is not None}}
+
+
+def collect_compact(lines) -> tuple:
+    """Like `executor.collect`, but builds the columnar body.
+
+    Returns `(body, error)`; `body` is the encoded JSON text.
+    """
+    enc, tail, error = ColumnarEncoder(), {}, None
+    for line in lines:                  # always drain, so the worker ends cleanly
+        ev = json.loads(line)
+        if "frame" in ev: enc.add(ev["frame"]); continue
+        if "error" in ev: error = ev
+        if "truncated" in ev: tail["truncated"] = ev["truncated"]
+        if "done" in ev:
+            tail["complexity"] = ev["complexity"]
+            tail["timings"] = ev.get("timings")
+    if error: return None, error
+    return json.dumps(enc.payload(**tail), separators=(",", ":"), default=repr), None
+
+
+# ───────────────────────────────────────────────────────────
+#  Content-Encoding
+# ───────────────────────────────────────────────────────────
+def pick_encoding(accept_encodings) -> str:
+    """Best of `ENCODINGS` for a werkzeug `request.accept_encodings`, or None."""
+    return accept_encodings.best_match(ENCODINGS)
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br": return brotli.compress(data, quality=5)
+    if encoding == "gzip": return gzip.compress(data, compresslevel=6, mtime=0)
+    raise ValueError(f"unsupported encoding: {encoding}")
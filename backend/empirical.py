@@ -0,0 +1,364 @@
+# empirical.py — TraceDS measured (empirical) complexity
+#
+# `estimate_complexity` in tracer.py guesses Big-O from the shape of the
+# source.  This module measures instead: it picks one function of the user
+# program, calls it on generated inputs of growing size — one pool job per
+# size, so the sizes run in parallel — counts executed lines and calls of the
+# user code (no snapshots), and fits the counts against growth curves.
+#
+#   worker side   iter_measure(code, n=…, function=…, input=…)  → sample event
+#   server side   estimate(submit, code, …)                     → best fit + samples
+
+import ast, json, math, random, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+from engines import FILENAME
+from tracer import TraceStopped, _error_line, encode_event
+
+INPUT_KINDS = ("list", "sorted_list", "dict", "str", "int", "linked", "tree")
+DEFAULT_SIZES = (8, 16, 32, 64, 128, 256, 512)
+INT_SIZES = (4, 8, 12, 16, 20, 24)      # int inputs may well be exponential
+MIN_SAMPLES = 3
+
+# candidate growth curves, simplest first (ties go to the simpler one)
+MODELS = (
+    ("O(1)",       lambda n: 0.0),
+    ("O(log n)",   lambda n: math.log2(n)),
+    ("O(n)",       lambda n: float(n)),
+    ("O(n log n)", lambda n: n * math.log2(n)),
+    ("O(n^2)",     lambda n: float(n * n)),
+    ("O(n^3)",     lambda n: float(n ** 3)),
+    ("O(2^n)",     None),               # any base: fitted in log space
+)
+_TIE = 0.02         # relative-error slack within which the simpler curve wins
+
+
+# ───────────────────────────────────────────────────────────
+#  target and input selection (runs in the web process)
+# ───────────────────────────────────────────────────────────
+def _functions(tree) -> dict:
+    return {n.name: n for n in tree.body if isinstance(n, ast.FunctionDef)}
+
+def _first_call(tree, funcs):
+    """First call of a top-level function from module-level code."""
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)): continue
+        for n in ast.walk(stmt):
+            if isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id in funcs:
+                return n
+    return None
+
+def _resolve(tree, arg):
+    if isinstance(arg, ast.Name):          # follow the last module-level `name = …`
+        name = arg.id
+        for stmt in tree.body:
+            if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+                    and isinstance(stmt.targets[0], ast.Name) and stmt.targets[0].id == name):
+                arg = stmt.value
+    return arg
+
+def _literal_kind(tree, arg):
+    arg = _resolve(tree, arg)
+    if isinstance(arg, (ast.List, ast.ListComp)): return "list"
+    if isinstance(arg, (ast.Dict, ast.DictComp)): return "dict"
+    if isinstance(arg, ast.Constant):
+        if isinstance(arg.value, bool): return None
+        if isinstance(arg.value, int): return "int"
+        if isinstance(arg.value, str): return "str"
+    return None
+
+def _literal_len(tree, arg):
+    arg = _resolve(tree, arg)
+    if isinstance(arg, ast.Dict): return len(arg.keys)
+    if isinstance(arg, (ast.List, ast.Tuple, ast.Set)): return len(arg.elts)
+    if isinstance(arg, ast.Constant) and isinstance(arg.value, str): return len(arg.value)
+    return None
+
+def _is_len_of(tree, expr, first) -> bool:
+    expr = _resolve(tree, expr)
+    return (isinstance(expr, ast.Call) and isinstance(expr.func, ast.Name) and expr.func.id == "len"
+            and len(expr.args) == 1 and isinstance(expr.args[0], ast.Name)
+            and isinstance(first, ast.Name) and expr.args[0].id == first.id)
+
+def _argument_spec(tree, expr, first) -> list:
+    """How the call site derives an extra argument from the input:
+    `["len", k]` (its size plus k, e.g. `len(arr) - 1`), `["value", v]` (a
+    constant that does not scale, e.g. a `0` low index) or `["mid"]`."""
+    if expr is None: return ["mid"]
+    if _is_len_of(tree, expr, first): return ["len", 0]
+    value = _resolve(tree, expr)
+    if (isinstance(value, ast.BinOp) and isinstance(value.op, (ast.Add, ast.Sub))
+            and _is_len_of(tree, value.left, first)
+            and isinstance(value.right, ast.Constant) and type(value.right.value) is int):
+        k = value.right.value
+        return ["len", k if isinstance(value.op, ast.Add) else -k]
+    if isinstance(value, ast.Constant):
+        v, size = value.value, _literal_len(tree, first)
+        if type(v) is int:
+            # `f([5, 3, 1], 0, 2)`: the last index of a literal input
+            if size is not None and v == size - 1 and v > 0: return ["len", -1]
+            return ["value", 0] if v == 0 else ["mid"]
+        return ["value", v]
+    return ["mid"]
+
+def _call_arguments(tree, node, call) -> list:
+    # one spec per parameter after the first that has no default
+    params = node.args.args[1:len(node.args.args) - len(node.args.defaults)]
+    if call is None or not call.args: return [["mid"] for _ in params]
+    keywords = {k.arg: k.value for k in call.keywords}
+    return [_argument_spec(tree, call.args[i + 1] if i + 1 < len(call.args) else keywords.get(p.arg),
+                           call.args[0])
+            for i, p in enumerate(params)]
+
+def choose_target(code: str, function: str = None, input: str = None) -> tuple:
+    """`(function, input kind, extra arguments)` to measure; raises
+    ValueError if there is none.  The extra arguments are specs for the
+    parameters after the first, taken from the call site (see
+    `_argument_spec`)."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise ValueError(f"SyntaxError: {e.msg} (line {e.lineno})")
+    funcs = _functions(tree)
+    call = _first_call(tree, funcs)
+    if function is None:
+        if call is not None: function = call.func.id
+        else: function = next((f for f, n in funcs.items() if n.args.args), None)
+        if function is None: raise ValueError("No top-level function with parameters to measure")
+    node = funcs.get(function)
+    if node is None: raise ValueError(f"No top-level function named {function!r}")
+    if not node.args.args: raise ValueError(f"{function}() takes no arguments to grow")
+    if input is None:
+        attrs = {n.attr for n in ast.walk(node) if isinstance(n, ast.Attribute)}
+        if "next" in attrs: input = "linked"
+        elif attrs & {"left", "right"}: input = "tree"
+        elif call is not None and call.func.id == function and call.args:
+            input = _literal_kind(tree, call.args[0])
+        if input is None:
+            input = "int" if node.args.args[0].arg in ("n", "k", "num", "number") else "list"
+        if input == "list" and any(w in function.lower() for w in ("search", "bisect")):
+            input = "sorted_list"
+    if input not in INPUT_KINDS:
+        raise ValueError(f"input must be one of {', '.join(INPUT_KINDS)}")
+    if call is None or call.func.id != function: call = _first_call(tree, {function})
+    return function, input, _call_arguments(tree, node, call)
+
+
+# ───────────────────────────────────────────────────────────
+#  measurement (runs in a pool worker)
+# ───────────────────────────────────────────────────────────
+class _Node:
+    """Generic list / tree node for generated inputs."""
+    def __init__(self, val):
+        self.val, self.next, self.left, self.right = val, None, None, None
+
+def _balanced(vals, lo, hi):
+    if lo > hi: return None
+    mid = (lo + hi) // 2
+    node = _Node(vals[mid])
+    node.left, node.right = _balanced(vals, lo, mid - 1), _balanced(vals, mid + 1, hi)
+    return node
+
+def make_input(kind: str, n: int):
+    rng = random.Random(n)                  # same input for the same size
+    if kind == "int": return n
+    if kind == "str": return "".join(rng.choice("abcdefghij") for _ in range(n))
+    vals = list(range(n)); rng.shuffle(vals)
+    if kind == "list": return vals
+    if kind == "sorted_list": return sorted(vals)
+    if kind == "dict": return {f"k{v}": v for v in vals}
+    if kind == "tree": return _balanced(sorted(vals), 0, n - 1)
+    head = None                             # linked
+    for v in reversed(vals):
+        node = _Node(v); node.next = head; head = node
+    return head
+
+def _definitions(code: str):
+    # functions, classes, imports and literal constants only: the program's
+    # own top-level run would otherwise be measured too
+    tree = ast.parse(code)
+    keep = []
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+                             ast.Import, ast.ImportFrom)):
+            keep.append(stmt)
+        elif isinstance(stmt, ast.Assign):
+            try: ast.literal_eval(stmt.value)
+            except (ValueError, TypeError, SyntaxError, RecursionError): continue
+            keep.append(stmt)
+    tree.body = keep
+    return compile(tree, FILENAME, "exec")
+
+def _argument(spec, n):
+    if spec[0] == "len": return n + spec[1]
+    if spec[0] == "value": return spec[1]
+    return n // 2
+
+def _arguments(fn, kind, n, args=None):
+    # the first parameter gets the generated input; later ones keep their
+    # defaults, follow the call site (`args`, e.g. `0, len(arr) - 1` →
+    # `0, n - 1`) or get a mid-range value (e.g. the key for insert / search)
+    code = fn.__code__
+    extra = max(code.co_argcount - 1 - len(fn.__defaults__ or ()), 0)
+    specs = list(args or ())[:extra]
+    specs += [["mid"]] * (extra - len(specs))
+    return [make_input(kind, n)] + [_argument(s, n) for s in specs]
+
+def iter_measure(code: str, n: int, function: str, input: str, args: list = None,
+                 time_limit: float = 1.0, encode: bool = False):
+    """Call `function` once on an input of size `n`, counting user-code work.
+
+    `args` are the specs for the parameters after the first (see
+    `choose_target`).
+    Yields `{"sample": {"n", "ops", "seconds"}}`, or an error event (with
+    `"limit": "time"` when `time_limit` runs out).  `ops` counts executed
+    lines plus calls of code compiled from the submitted source.
+    """
+    wrap = encode_event if encode else (lambda ev: ev)
+    ops, clock = [0], time.perf_counter
+    try:
+        ns = {}
+        exec(_definitions(code), ns)
+        fn = ns[function]
+        call_args = _arguments(fn, input, n, args)
+        deadline = clock() + time_limit
+
+        def on_line(frame, event, arg):
+            if event == "line":
+                ops[0] += 1
+                if not ops[0] & 0x3FF and clock() > deadline: raise TraceStopped()
+            return on_line
+
+        def on_call(frame, event, arg):
+            if frame.f_code.co_filename != FILENAME: return None
+            ops[0] += 1
+            return on_line
+
+        t0 = clock()
+        sys.settrace(on_call)
+        try:
+            fn(*call_args)
+        finally:
+            sys.settrace(None)
+        seconds = clock() - t0
+    except TraceStopped:
+        yield wrap({"error": f"Time limit exceeded ({time_limit:g}s)", "line": None, "limit": "time"})
+        return
+    except RecursionError as e:
+        yield wrap({"error": f"RecursionError: {e}", "line": _error_line(e), "limit": "recursion"})
+        return
+    except MemoryError:
+        raise                               # the worker reports and recycles
+    except Exception as e:
+        if not encode: raise
+        yield wrap({"error": f"{type(e).__name__}: {e}", "line": _error_line(e)})
+        return
+    yield wrap({"sample": {"n": n, "ops": ops[0], "seconds": round(seconds, 6)}})
+
+
+# ───────────────────────────────────────────────────────────
+#  curve fitting (runs in the web process)
+# ───────────────────────────────────────────────────────────
+def _fit(ns, ys, g):
+    """Weighted least squares for y ≈ a + b·g(n), a, b ≥ 0; relative RMS error."""
+    gs, ws = [g(n) for n in ns], [1 / (y * y) for y in ys]
+    sw, sg = sum(ws), sum(w * x for w, x in zip(ws, gs))
+    sy = sum(w * y for w, y in zip(ws, ys))
+    sgg = sum(w * x * x for w, x in zip(ws, gs))
+    sgy = sum(w * x * y for w, x, y in zip(ws, gs, ys))
+    det = sw * sgg - sg * sg
+    b = (sw * sgy - sg * sy) / det if det > 1e-12 * max(sw * sgg, 1e-300) else 0.0
+    if b <= 0: a, b = sy / sw, 0.0
+    else:
+        a = (sy - b * sg) / sw
+        if a < 0: a, b = 0.0, sgy / sgg
+    err = math.sqrt(sum(((a + b * x - y) / y) ** 2 for x, y in zip(gs, ys)) / len(ys))
+    return err, a, b
+
+def _fit_exponential(ns, ys):
+    """y ≈ a·r^n by least squares on log y; relative RMS error."""
+    k, ls = len(ns), [math.log(y) for y in ys]
+    mn, ml = sum(ns) / k, sum(ls) / k
+    var = sum((n - mn) ** 2 for n in ns)
+    slope = sum((n - mn) * (l - ml) for n, l in zip(ns, ls)) / var if var else 0.0
+    if slope <= 0: return math.inf
+    try:
+        return math.sqrt(sum((math.exp(ml + slope * (n - mn)) / y - 1) ** 2
+                             for n, y in zip(ns, ys)) / k)
+    except OverflowError:
+        return math.inf
+
+def fit_growth(samples) -> dict:
+    """Best growth curve for `[{"n", "ops"}, …]` with a 0–1 confidence."""
+    ns = [s["n"] for s in samples]
+    ys = [max(s["ops"], 1) for s in samples]
+    if max(ys) <= min(ys) * 1.05:           # flat: nothing to fit
+        return {"complexity": "O(1)", "confidence": round(1 - (max(ys) / min(ys) - 1), 2),
+                "fits": {"O(1)": 0.0}}
+    errors = {}
+    for name, g in MODELS:
+        errors[name] = _fit(ns, ys, g)[0] if g else _fit_exponential(ns, ys)
+    best = min(errors.values())
+    chosen = next(name for name in errors if errors[name] <= best + _TIE)
+    e1 = errors[chosen]
+    e2 = min(e for name, e in errors.items() if name != chosen)
+    confidence = max(0.0, (1 - min(e1, 1.0)) * (1 - e1 / e2)) if e2 > 0 else 0.0
+    return {"complexity": chosen, "confidence": round(confidence, 2),
+            "fits": {name: round(e, 4) for name, e in errors.items()}}
+
+
+def estimate(submit, code: str, function: str = None, input: str = None,
+             sizes=None, time_limit: float = 1.0) -> dict:
+    """Measure `function` at every size in parallel and fit the costs.
+
+    `submit(code, opts)` is `TracePool.submit`; its exceptions (e.g. a
+    saturated pool) propagate before anything runs.  Raises ValueError for
+    bad options.  The result carries `complexity`, `confidence`, the raw
+    `samples`, the `skipped` sizes and per-curve `fits`, or an `error` when
+    too few sizes finished.
+    """
+    function, input, args = choose_target(code, function, input)
+    if sizes is None:
+        sizes = INT_SIZES if input == "int" else DEFAULT_SIZES
+    if (not isinstance(sizes, (list, tuple)) or not MIN_SAMPLES <= len(sizes) <= 12
+            or not all(isinstance(n, int) and 1 <= n <= 100_000 for n in sizes)):
+        raise ValueError(f"sizes must be {MIN_SAMPLES}-12 integers between 1 and 100000")
+    sizes = sorted(set(sizes))
+
+    jobs = []
+    try:
+        for n in sizes:
+            jobs.append(submit(code, {"mode": "measure", "n": n, "function": function,
+                                      "input": input, "args": args, "time_limit": time_limit}))
+    except BaseException:
+        for job in jobs: job.close()
+        raise
+
+    def drain(job):
+        try: return [json.loads(line) for line in job]
+        finally: job.close()
+
+    with ThreadPoolExecutor(len(jobs)) as ex:
+        results = list(ex.map(drain, jobs))
+
+    samples, skipped = [], []
+    for n, events in zip(sizes, results):
+        ev = next((e for e in events if "sample" in e or "error" in e), {"error": "no result"})
+        if "sample" in ev: samples.append(ev["sample"])
+        else: skipped.append({"n": n, "error": ev["error"], "line": ev.get("line"),
+                              "limit": ev.get("limit")})
+    out = {"function": function, "input": input, "samples": samples, "skipped": skipped}
+    if len(samples) < MIN_SAMPLES:
+        first = skipped[0] if skipped else {}
+        out["error"] = (first.get("error") if first.get("n") == sizes[0]
+                        else f"Only {len(samples)} sizes finished; at least {MIN_SAMPLES} are needed")
+        out["line"] = first.get("line") if first.get("n") == sizes[0] else None
+        return out
+    out.update(fit_growth(samples))
+    if out["complexity"] == "O(1)" and ["mid"] in args:
+        # e.g. `f(arr, lo, hi)` with no call site to copy: guessed bounds can
+        # leave the work flat whatever the input size
+        out["confidence"] = 0.0
+        out["warning"] = ("Cost did not grow with the input, but some arguments were guessed; "
+                          "call the function once from the program to show how")
+    return out
@@ -0,0 +1,258 @@
+# engines.py — TraceDS tracing backends
+#
+# An engine turns user source into a code object and runs it, reporting two
+# things back to the tracer: `on_line(lineno)` once a statement has finished
+# and `on_step(frame, force=False)` when that frame's locals should be
+# snapshotted (`force` marks call/return frames that sampling must keep).
+# Both honour a `Selection` (selection.py): out-of-scope code gets no hooks.
+#
+#   ast         rewrites the AST to call hooks after every statement (any Python)
+#   monitoring  PEP 669 `sys.monitoring` LINE/RETURN events (Python 3.12+); sees
+#               comprehensions and returns, and leaves the bytecode untouched
+#
+# Compiled code objects are cached per (engine, source hash), so repeated
+# submissions skip parsing, instrumenting and compiling.
+
+import ast, hashlib, sys, threading
+from collections import OrderedDict
+
+from timing import NULL_TIMER
+
+FILENAME = "<traceds>"         # user code's filename in tracebacks / code objects;
+                               # not "<string>", which exec()-generated stdlib code
+                               # (e.g. dataclass methods) also uses
+
+
+class Engine:
+    name = None
+    available = True
+
+    def compile(self, code_str: str, sel, timer=NULL_TIMER):
+        raise NotImplementedError
+
+    def execute(self, code_obj, on_line, on_step, sel):
+        raise NotImplementedError
+
+
+# ───────────────────────────────────────────────────────────
+#  AST injection
+# ───────────────────────────────────────────────────────────
+class _Injector(ast.NodeTransformer):
+    def __init__(self, sel):
+        # enclosing function and class names — the parts of `co_qualname`
+        # the monitoring engine scopes on
+        self.sel, self.funcs = sel, []
+
+    def hook(self, lineno, force=False):
+        return [
+            ast.Expr(ast.Call(ast.Name("__trace_line__",ast.Load()),
+                              [ast.Constant(lineno)],[])),
+            ast.Expr(ast.Call(ast.Name("snapshot",ast.Load()),
+                              [ast.Constant(True)] if force else [],[])),
+        ]
+
+    def in_scope(self):
+        if not self.funcs: return self.sel.module_in_scope()
+        return self.sel.function_in_scope(self.funcs[-1], self.funcs[:-1])
+
+    def inject(self, stmts):
+        if self.sel.granularity != "line" or not self.in_scope(): return stmts
+        out=[]
+        for s in stmts:
+            out.append(s)
+            if hasattr(s,"lineno") and self.sel.line_in_scope(s.lineno):
+                out.extend(self.hook(s.lineno))
+        return out
+    def visit_Module(self,n): self.generic_visit(n); n.body=self.inject(n.body); return n
+    def visit_Block(self,n): self.generic_visit(n); n.body=self.inject(n.body); return n
+    visit_If=visit_Block; visit_With=visit_Block; visit_Try=visit_Block
+
+    def visit_Loop(self,n):
+        self.visit_Block(n)
+        if self.sel.granularity == "loop" and self.in_scope() and self.sel.line_in_scope(n.lineno):
+            n.body = self.hook(n.lineno) + n.body       # once per iteration
+        return n
+    visit_For=visit_Loop; visit_While=visit_Loop
+
+    def visit_FunctionDef(self,n):
+        self.funcs.append(n.name)
+        try:
+            last = n.body[-1]
+            self.visit_Block(n)
+            if self.sel.call_hooks and self.in_scope():
+                # forced frames on entry (after the docstring, which has to
+                # stay first to be one) and on falling off the end
+                doc = 1 if ast.get_docstring(n, clean=False) is not None else 0
+                n.body = n.body[:doc] + self.hook(n.lineno, True) + n.body[doc:]
+                if not isinstance(last, ast.Return):
+                    n.body += self.hook(getattr(last, "end_lineno", None) or last.lineno, True)
+        finally:
+            self.funcs.pop()
+        return n
+    visit_AsyncFunctionDef=visit_FunctionDef
+
+    def visit_ClassDef(self,n):
+        self.funcs.append(n.name)
+        try: self.generic_visit(n)
+        finally: self.funcs.pop()
+        return n
+
+    def visit_Return(self,n):
+        if not (self.sel.call_hooks and self.funcs and self.in_scope()): return n
+        if n.value is None: return self.hook(n.lineno, True) + [n]
+        # evaluate first so the frame shows the state the function returns with
+        return ([ast.Assign([ast.Name("__ret__",ast.Store())], n.value)]
+                + self.hook(n.lineno, True)
+                + [ast.Return(ast.Name("__ret__",ast.Load()))])
+
+
+class AstEngine(Engine):
+    name = "ast"
+
+    def compile(self, code_str, sel, timer=NULL_TIMER):
+        with timer.phase("parse"): tree = ast.parse(code_str)
+        with timer.phase("instrument"):
+            tree = _Injector(sel).visit(tree); ast.fix_missing_locations(tree)
+        with timer.phase("compile"): return compile(tree, FILENAME, "exec")
+
+    def execute(self, code_obj, on_line, on_step, sel):
+        snapshot = lambda force=False: on_step(sys._getframe(1), force)
+        ns = {"__trace_line__": on_line, "snapshot": snapshot}
+        exec(code_obj, ns, ns)
+
+
+# ───────────────────────────────────────────────────────────
+#  sys.monitoring (PEP 669)
+# ───────────────────────────────────────────────────────────
+class MonitoringEngine(Engine):
+    name = "monitoring"
+    available = hasattr(sys, "monitoring")
+    _lock = threading.Lock()   # monitoring is process-wide: one run at a time
+
+    def compile(self, code_str, sel, timer=NULL_TIMER):
+        with timer.phase("parse"): tree = ast.parse(code_str)
+        with timer.phase("instrument"):
+            # body-start line → (loop line, lines of the inner loop starting
+            # there or None), and every line inside a loop, for per-iteration
+            # frames
+            loops = [n for n in ast.walk(tree) if isinstance(n, (ast.For, ast.AsyncFor, ast.While))]
+            loop_starts = {n.body[0].lineno: (n.lineno, _loop_span(n.body[0])) for n in loops}
+            loop_lines = frozenset(l for n in loops for l in range(n.lineno, n.end_lineno + 1))
+        with timer.phase("compile"):
+            return compile(tree, FILENAME, "exec"), (loop_starts, loop_lines)
+
+    def execute(self, compiled, on_line, on_step, sel):
+        if not self.available:
+            raise RuntimeError("the 'monitoring' engine needs Python 3.12+")
+        code_obj, (loop_starts, loop_lines) = compiled
+        mon = sys.monitoring
+        ev, me = mon.events, threading.get_ident()
+        pending, scoped = {}, {}      # id(frame) → running line; code → in scope?
+        last = {}                     # id(frame) → previous loop line (loop granularity)
+
+        def in_scope(code):
+            ok = scoped.get(code)
+            if ok is None:
+                chain = [n for n in code.co_qualname.split(".") if n != "<locals>"]
+                ok = scoped[code] = code.co_filename == FILENAME and (
+                    sel.module_in_scope() if chain == ["<module>"]
+                    else sel.function_in_scope(chain[-1], chain[:-1]))
+            return ok
+
+        # Library and out-of-scope code is switched off per location the
+        # first time it is seen.  A LINE event fires *before* its line runs,
+        # so it closes the frame's previous line; RETURN closes the last one.
+        def on_line_event(code, lineno):
+            if not (in_scope(code) and sel.line_in_scope(lineno)): return mon.DISABLE
+            if threading.get_ident() != me: return
+            f = sys._getframe(1)
+            prev, pending[id(f)] = pending.get(id(f)), lineno
+            if prev is not None: on_line(prev); on_step(f)
+
+        def on_loop_line(code, lineno):
+            # first line of a loop body: once per iteration, reported as the
+            # loop's own line like the AST engine does.  When the body starts
+            # with another loop, that line also fires every time the inner
+            # loop goes round; those come straight from the inner loop's own
+            # lines, so the previous line in the frame tells them apart.
+            if lineno not in loop_lines or not in_scope(code): return mon.DISABLE
+            if threading.get_ident() != me: return
+            f = sys._getframe(1)
+            prev, last[id(f)] = last.get(id(f)), lineno
+            start = loop_starts.get(lineno)
+            if start is None: return
+            header, inner = start
+            if not sel.line_in_scope(header): return
+            if inner and prev is not None and inner[0] < prev <= inner[1]: return
+            on_line(header); on_step(f)
+
+        def on_start(code, offset):
+            if not in_scope(code): return mon.DISABLE
+            if threading.get_ident() != me or code.co_name == "<module>": return
+            on_line(code.co_firstlineno); on_step(sys._getframe(1), True)
+
+        def on_return(code, offset, retval):
+            if not in_scope(code): return mon.DISABLE
+            if threading.get_ident() != me: return
+            f = sys._getframe(1)
+            prev = pending.pop(id(f), None); last.pop(id(f), None)
+            if sel.call_hooks and code.co_name != "<module>":
+                on_line(prev or f.f_lineno); on_step(f, True)
+            elif prev is not None:
+                on_line(prev); on_step(f)
+
+        def on_unwind(code, offset, exc):
+            f = sys._getframe(1)
+            pending.pop(id(f), None); last.pop(id(f), None)
+
+        callbacks = {ev.PY_RETURN: on_return, ev.PY_UNWIND: on_unwind}
+        if sel.granularity == "line": callbacks[ev.LINE] = on_line_event
+        if sel.granularity == "loop": callbacks[ev.LINE] = on_loop_line
+        if sel.call_hooks: callbacks[ev.PY_START] = on_start
+
+        with self._lock:
+            tool = next(t for t in range(6) if mon.get_tool(t) is None)
+            mon.use_tool_id(tool, "traceds")
+            try:
+                mask = 0
+                for e, cb in callbacks.items():
+                    mon.register_callback(tool, e, cb); mask |= e
+                mon.set_events(tool, mask)
+                mon.restart_events()
+                exec(code_obj, {})
+            finally:
+                mon.set_events(tool, 0)
+                for e in callbacks: mon.register_callback(tool, e, None)
+                mon.free_tool_id(tool)
+
+
+def _loop_span(stmt):
+    """(first, last) line of `stmt` if it is a loop, else None."""
+    if isinstance(stmt, (ast.For, ast.AsyncFor, ast.While)): return stmt.lineno, stmt.end_lineno
+    return None
+
+
+ENGINES = {e.name: e for e in (AstEngine(), MonitoringEngine())}
+
+def available_engines() -> list:
+    return [name for name, e in ENGINES.items() if e.available]
+
+
+# ───────────────────────────────────────────────────────────
+#  compiled-code cache
+# ───────────────────────────────────────────────────────────
+_CODE_CACHE, _CODE_CACHE_SIZE, _code_lock = OrderedDict(), 128, threading.Lock()
+
+def compile_cached(engine: Engine, code_str: str, sel, timer=NULL_TIMER):
+    """`engine.compile(code_str, sel)`, memoised on the source hash."""
+    key = (engine.name, hashlib.sha256(code_str.encode()).hexdigest(), sel.compile_key())
+    with _code_lock:
+        code_obj = _CODE_CACHE.get(key)
+        if code_obj is not None:
+            _CODE_CACHE.move_to_end(key)
+            return code_obj
+    code_obj = engine.compile(code_str, sel, timer)
+    with _code_lock:
+        _CODE_CACHE[key] = code_obj
+        while len(_CODE_CACHE) > _CODE_CACHE_SIZE: _CODE_CACHE.popitem(last=False)
+    return code_obj
@@ -0,0 +1,182 @@
+# executor.py — TraceDS sandboxed execution pool
+#
+# User programs never run inside the Flask process.  A fixed set of worker
+# processes (forked from a fork server that has `tracer` pre-imported) each
+# take one job at a time; a job that overruns its wall-clock limit, or takes
+# its worker down (e.g. the address-space rlimit), gets the worker killed and
+# replaced without touching the other jobs.
+
+import json, os, queue, threading, time
+import multiprocessing as mp
+
+from empirical import iter_measure
+from tracer import encode_event, iter_trace
+
+try:
+    import resource                     # POSIX only
+except ImportError:
+    resource = None
+
+
+class PoolSaturated(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+# `opts["mode"]` picks what a job runs: a full trace or one measured call
+_RUNNERS = {"trace": iter_trace, "measure": iter_measure}
+
+
+# ───────────────────────────────────────────────────────────
+#  worker side
+# ───────────────────────────────────────────────────────────
+def _worker_main(conn, mem_limit):
+    if resource and mem_limit:
+        # RLIMIT_RSS is not enforced by Linux, so cap the address space
+        resource.setrlimit(resource.RLIMIT_AS, (mem_limit, mem_limit))
+    while True:
+        try:
+            code, opts = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        recycle, run = False, _RUNNERS[opts.pop("mode", "trace")]
+        try:
+            for line in run(code, encode=True, **opts):
+                conn.send(line)
+        except MemoryError:
+            conn.send(encode_event({"error": "Memory limit exceeded", "line": None, "limit": "memory"}))
+            recycle = True
+        conn.send(("end", recycle))
+        if recycle: return
+
+
+class _Worker:
+    def __init__(self, ctx, mem_limit):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, mem_limit),
+                                name="trace-worker", daemon=True)
+        self.proc.start()
+        child.close()
+
+    def alive(self):
+        return self.proc.is_alive() and not self.conn.closed
+
+    def kill(self):
+        self.proc.kill(); self.proc.join()
+        self.conn.close()
+
+
+# ───────────────────────────────────────────────────────────
+#  pool
+# ───────────────────────────────────────────────────────────
+class TracePool:
+    """Pre-forked trace workers behind a bounded wait queue.
+
+    `submit()` either reserves a slot (one per worker plus `max_queue` waiting
+    requests) or raises `PoolSaturated` straight away; the returned job is an
+    iterable of NDJSON lines and must be closed (WSGI does this for us).
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = 16, timeout: float = 5.0,
+                 mem_limit: int = 512 * 1024 * 1024):
+        if "forkserver" in mp.get_all_start_methods():
+            self._ctx = mp.get_context("forkserver")
+            self._ctx.set_forkserver_preload(["tracer", "empirical"])
+        else:
+            self._ctx = mp.get_context("spawn")
+        self.size, self.timeout, self.mem_limit = workers or os.cpu_count() or 1, timeout, mem_limit
+        self._slots = threading.BoundedSemaphore(self.size + max_queue)
+        self._idle = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(_Worker(self._ctx, mem_limit))
+        self.respawns = 0
+
+    def submit(self, code: str, opts: dict = None) -> "_Job":
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+        return _Job(self, code, opts or {})
+
+    def _spawn(self):
+        self.respawns += 1
+        return _Worker(self._ctx, self.mem_limit)
+
+    def _execute(self, code, opts):
+        worker, clean = self._idle.get(), False
+        if not worker.alive(): worker = self._spawn()
+        try:
+            try:
+                worker.conn.send((code, opts))
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    left = deadline - time.monotonic()
+                    if left <= 0 or not worker.conn.poll(left):
+                        yield encode_event({"error": f"Time limit exceeded ({self.timeout:g}s)",
+                                            "line": None, "limit": "time"})
+                        return
+                    msg = worker.conn.recv()
+                    if isinstance(msg, tuple):      # ("end", recycle)
+                        clean = not msg[1]
+                        return
+                    yield msg
+            except (EOFError, OSError):             # worker died mid-job
+                yield encode_event({"error": "Execution aborted (resource limit exceeded)",
+                                    "line": None, "limit": "resources"})
+        finally:
+            if not clean:
+                worker.kill()
+                # replace it now so the next job finds a warm worker; if that
+                # fails (e.g. interpreter shutdown) the dead one is replaced
+                # on checkout instead
+                try: worker = self._spawn()
+                except Exception: pass
+            self._idle.put(worker)
+
+    def close(self):
+        while True:
+            try: self._idle.get_nowait().kill()
+            except queue.Empty: return
+
+
+class _Job:
+    """One reserved slot; iterating runs the program, `close()` frees the slot."""
+
+    def __init__(self, pool, code, opts):
+        self._pool, self._code, self._opts = pool, code, opts
+        self._it, self._released = None, False
+
+    def __iter__(self):
+        self._it = self._pool._execute(self._code, self._opts)
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            self.close(); raise
+
+    def close(self):
+        if self._it is not None: self._it.close()
+        if not self._released:
+            self._released = True
+            self._pool._slots.release()
+
+
+def collect(lines) -> tuple:
+    """Fold NDJSON trace lines into the classic `/trace` JSON body.
+
+    Frame lines are spliced in as text so frames are never decoded and
+    re-encoded; returns `(body, error)` where `error` is the error event.
+    """
+    prefix, frames, tail, error = '{"frame":', [], {}, None
+    for line in lines:                  # always drain, so the worker ends cleanly
+        if line.startswith(prefix):
+            frames.append(line[len(prefix):-2])         # strip wrapper + "}\n"
+            continue
+        ev = json.loads(line)
+        if "error" in ev: error = ev
+        if "truncated" in ev: tail["truncated"] = ev["truncated"]
+        if "done" in ev:
+            tail["complexity"] = ev["complexity"]
+            if "timings" in ev: tail["timings"] = ev["timings"]
+    if error: return None, error
+    rest = "".join("," + json.dumps(k) + ":" + json.dumps(v) for k, v in tail.items())
+    return '{"frames":[' + ",".join(frames) + "]" + rest + "}", None
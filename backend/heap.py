@@ -0,0 +1,222 @@
+# heap.py — TraceDS identity-interned heap graph
+#
+# User objects (list nodes, tree nodes, anything with instance attributes) get
+# a stable id the first time a trace sees them.  Each step only emits records
+# for objects that are new or whose attributes changed; frames reference
+# objects by id.  Changes are found without walking the graph: the classes of
+# interned objects get a `__setattr__` that marks the instance dirty, and the
+# few objects that cannot be watched that way are re-checked every step.
+# Everything is iterative, so deep lists/trees and cycles are fine.
+
+import functools, types
+
+from snapshots import same
+
+_PRIMS = (int, float, str, bool, type(None))
+_CONTAINERS = (list, tuple, dict, set, frozenset)
+_NOT_NODES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+              types.MethodType, types.CodeType, types.FrameType) + _PRIMS + _CONTAINERS
+_MAX_NESTING = 32           # containers nested deeper than this are repr()'d
+_PRIM_TYPES = frozenset(_PRIMS)
+
+
+@functools.lru_cache(maxsize=1024)
+def _slots(cls) -> tuple:
+    """Every `__slots__` attribute name along the MRO of `cls`."""
+    names = []
+    for c in cls.__mro__:
+        declared = c.__dict__.get("__slots__", ())
+        if isinstance(declared, str): declared = (declared,)
+        names.extend(n for n in declared if n not in ("__dict__", "__weakref__"))
+    return tuple(names)
+
+def is_node(val) -> bool:
+    """An object with its own attributes (i.e. an instance of a user class),
+    stored in a `__dict__` or in `__slots__`."""
+    if isinstance(val, _NOT_NODES): return False
+    return hasattr(val, "__dict__") or bool(_slots(type(val)))
+
+def holds_nodes(val, depth=0) -> bool:
+    """Whether a container has a node anywhere inside it."""
+    items = val.values() if isinstance(val, dict) else val
+    types = set(map(type, items))
+    if types <= _PRIM_TYPES: return False           # the common case, at C speed
+    for v in (val.values() if isinstance(val, dict) else val):
+        if type(v) in _PRIM_TYPES: continue
+        if is_node(v): return True
+        if depth < _MAX_NESTING and isinstance(v, _CONTAINERS) and holds_nodes(v, depth + 1):
+            return True
+    return False
+
+def attributes(obj) -> dict:
+    """`vars(obj)` plus any assigned slots."""
+    d, slots = getattr(obj, "__dict__", None), _slots(type(obj))
+    if not slots: return d
+    out = {}
+    for name in slots:
+        try: out[name] = getattr(obj, name)
+        except AttributeError: pass         # declared but never assigned
+    if d: out.update(d)
+    return out
+
+
+class HeapTable:
+    """Assigns ids to objects once and reports per-step record changes.
+
+    `step(roots)` takes `{name: obj}` for the node-valued locals and returns
+    `(refs, changed)`: `{name: id}` and `{id: record}` for every object that
+    is new or changed since the previous step.  A record maps attribute
+    names to primitives, `{"ref": id}` or lists of those.  List / dict locals
+    go through `encode()` first, so nodes held in them (a BFS queue, a DFS
+    stack) are interned too.
+    """
+
+    def __init__(self):
+        self._ids, self._objs = {}, []        # id(obj) → nid; objs keep id()s unique
+        self._records = {}                    # nid → last emitted record
+        self._dirty, self._polled = set(), set()
+        self._patched = {}                    # cls → original __setattr__ in cls.__dict__
+        self._pending = []                    # interned by encode(), recorded by step()
+
+    # ── identity ──────────────────────────────────────────
+    def _intern(self, obj, work):
+        nid = self._ids.get(id(obj))
+        if nid is None:
+            nid = self._ids[id(obj)] = len(self._objs) + 1
+            self._objs.append(obj)
+            if not self._watch(type(obj)): self._polled.add(nid)
+            work.append(obj)
+        return nid
+
+    def _watch(self, cls):
+        if cls in self._patched: return self._patched[cls] is not False
+        orig, dirty = cls.__setattr__, self._dirty
+        def __setattr__(obj, name, value):
+            orig(obj, name, value); dirty.add(id(obj))
+        try:
+            own = cls.__dict__.get("__setattr__")
+            cls.__setattr__ = __setattr__
+        except (TypeError, AttributeError):   # builtin / extension types
+            self._patched[cls] = False
+            return False
+        self._patched[cls] = own
+        return True
+
+    def close(self):
+        """Put the original `__setattr__` back on every patched class."""
+        for cls, own in self._patched.items():
+            if own is False: continue
+            try:
+                if own is None: del cls.__setattr__
+                else: cls.__setattr__ = own
+            except (TypeError, AttributeError):
+                pass
+        self._patched.clear()
+
+    # ── records ───────────────────────────────────────────
+    def _encode(self, val, work, depth=0):
+        if isinstance(val, _PRIMS): return val
+        if is_node(val): return {"ref": self._intern(val, work)}
+        if depth < _MAX_NESTING:
+            if isinstance(val, (list, tuple)):
+                return [self._encode(v, work, depth + 1) for v in val]
+            if isinstance(val, dict):           # e.g. trie children, adjacency maps
+                return {"dict": [[self._encode(k, work, depth + 1), self._encode(v, work, depth + 1)]
+                                 for k, v in val.items()]}
+            if isinstance(val, (set, frozenset)):
+                return {"set": [self._encode(v, work, depth + 1) for v in val]}
+        return repr(val)
+
+    def encode(self, val):
+        """A list / dict local with every node inside it replaced by
+        `{"ref": id}`; containers without nodes come back as they are."""
+        if not holds_nodes(val): return val
+        return self._encode_local(val, self._pending)
+
+    def _encode_local(self, val, work, depth=0):
+        # like _encode, but lists / tuples / dicts keep their shape so the
+        # frame looks the same as for a container of plain values
+        if is_node(val): return {"ref": self._intern(val, work)}
+        if depth < _MAX_NESTING:
+            if isinstance(val, list): return [self._encode_local(v, work, depth + 1) for v in val]
+            if isinstance(val, tuple): return tuple(self._encode_local(v, work, depth + 1) for v in val)
+            if isinstance(val, dict):
+                return {k: self._encode_local(v, work, depth + 1) for k, v in val.items()}
+            if isinstance(val, (set, frozenset)) and holds_nodes(val):
+                return self._encode(val, work, depth)
+        return val
+
+    def _record(self, obj, work):
+        rec = {}
+        for name, val in attributes(obj).items():
+            if name.startswith("__"): continue
+            rec[name] = self._encode(val, work)
+            if isinstance(val, (list, tuple, dict, set)):
+                # container attributes change without __setattr__
+                self._polled.add(self._ids[id(obj)])
+        return rec
+
+    def step(self, roots: dict):
+        work, self._pending = self._pending, []
+        refs = {name: self._intern(obj, work) for name, obj in roots.items()}
+        for oid in self._dirty:
+            nid = self._ids.get(oid)
+            if nid is not None: work.append(self._objs[nid - 1])
+        self._dirty.clear()
+        work.extend(self._objs[nid - 1] for nid in self._polled)
+
+        changed = {}
+        while work:
+            obj = work.pop()
+            nid = self._ids[id(obj)]
+            if nid in changed: continue
+            rec = self._record(obj, work)
+            if not same(rec, self._records.get(nid)):
+                self._records[nid] = changed[nid] = rec
+        return refs, changed
+
+
+# ───────────────────────────────────────────────────────────
+#  legacy views (what the visualizers draw)
+# ───────────────────────────────────────────────────────────
+def _ref(val):
+    return val["ref"] if isinstance(val, dict) else None
+
+def linked_view(nodes: dict, nid) -> list:
+    """Values along `.next` from `nid`, stopping at the end or a cycle."""
+    out, seen = [], set()
+    while nid is not None and nid not in seen:
+        seen.add(nid); rec = nodes[nid]
+        out.append(rec.get("val")); nid = _ref(rec.get("next"))
+    return out
+
+def tree_view(nodes: dict, nid) -> dict:
+    """Nested `{"id", "val", …, "left", "right"}` dicts, built iteratively."""
+    if nid is None: return None
+    root, seen = {}, set()
+    stack = [(nid, root)]
+    while stack:
+        nid, out = stack.pop()
+        seen.add(nid)
+        out["id"] = nid
+        for k, v in nodes[nid].items():
+            if isinstance(v, _PRIMS): out[k] = v
+        for side in ("left", "right"):
+            child = _ref(nodes[nid].get(side))
+            if child is None or child in seen:
+                out[side] = None
+            else:
+                out[side] = {}; stack.append((child, out[side]))
+    return root
+
+def materialize(frames):
+    """Rebuild the old `linked` / `trees` frame keys from `refs` + `heap`."""
+    nodes = {}
+    for f in frames:
+        nodes.update((int(k), v) for k, v in f.get("heap", {}).items())
+        linked, trees = {}, {}
+        for name, nid in f.get("refs", {}).items():
+            rec = nodes[nid]
+            if "next" in rec: linked[name] = linked_view(nodes, nid)
+            elif "left" in rec or "right" in rec: trees[name] = tree_view(nodes, nid)
+        yield {**f, "linked": linked, "trees": trees}
@@ -0,0 +1,94 @@
+# selection.py — TraceDS selective / sampled tracing options
+#
+# Which part of a program a trace covers (lines, functions), which locals a
+# frame carries (watch list) and how often a frame is taken (granularity,
+# sampling).  Engines use the scope to avoid instrumenting code nobody looks
+# at; the snapshot hook uses the watch list and sampling rate.
+
+
+class Selection:
+    """Request-level tracing options; every field is optional.
+
+    watch              local names to serialize (None → all)
+    lines              [[start, end], …] inclusive line ranges to trace
+    exclude_lines      line ranges to skip
+    functions          function names to trace (module code is then skipped);
+                       a class name covers its methods
+    exclude_functions  function / class names to skip, including anything nested
+    granularity        "line" (every statement), "loop" (start of every loop
+                       iteration) or "call" (function entry / return only)
+    sample_every       keep one frame in N; calls and returns are always kept
+    """
+    GRANULARITIES = ("line", "loop", "call")
+    FIELDS = ("watch", "lines", "exclude_lines", "functions", "exclude_functions",
+              "granularity", "sample_every")
+
+    def __init__(self, watch=None, lines=None, exclude_lines=None, functions=None,
+                 exclude_functions=None, granularity="line", sample_every=1):
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(self.GRANULARITIES)}")
+        if not isinstance(sample_every, int) or sample_every < 1:
+            raise ValueError("sample_every must be a positive integer")
+        self.watch = _names(watch, "watch")
+        self.lines = _ranges(lines, "lines")
+        self.exclude_lines = _ranges(exclude_lines, "exclude_lines")
+        self.functions = _names(functions, "functions")
+        self.exclude_functions = _names(exclude_functions, "exclude_functions") or frozenset()
+        self.granularity, self.sample_every = granularity, sample_every
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from a request payload, ignoring unknown keys."""
+        return cls(**{k: data[k] for k in cls.FIELDS if data.get(k) is not None})
+
+    def to_dict(self) -> dict:
+        out = {"granularity": self.granularity, "sample_every": self.sample_every}
+        for k in ("watch", "functions", "exclude_functions"):
+            if getattr(self, k): out[k] = sorted(getattr(self, k))
+        for k in ("lines", "exclude_lines"):
+            if getattr(self, k) is not None: out[k] = [list(r) for r in getattr(self, k)]
+        return out
+
+    @property
+    def call_hooks(self) -> bool:
+        """Whether function entry/return get their own (forced) frames."""
+        return self.granularity == "call" or self.sample_every > 1
+
+    def compile_key(self) -> str:
+        # only the scope and the hook layout change the instrumented code
+        d = self.to_dict(); d.pop("watch", None); d.pop("sample_every", None)
+        d["call_hooks"] = self.call_hooks
+        return repr(sorted(d.items()))
+
+    def line_in_scope(self, lineno) -> bool:
+        if self.lines is not None and not any(a <= lineno <= b for a, b in self.lines):
+            return False
+        return not (self.exclude_lines and any(a <= lineno <= b for a, b in self.exclude_lines))
+
+    def function_in_scope(self, name, enclosing=()) -> bool:
+        """`enclosing` are the names of the functions `name` is nested in."""
+        chain = (*enclosing, name)
+        if any(n in self.exclude_functions for n in chain): return False
+        return self.functions is None or any(n in self.functions for n in chain)
+
+    def module_in_scope(self) -> bool:
+        return self.functions is None
+
+
+def _names(val, field):
+    if val is None: return None
+    if isinstance(val, str): val = [val]
+    if not all(isinstance(v, str) for v in val):
+        raise ValueError(f"{field} must be a list of names")
+    return frozenset(val)
+
+def _ranges(val, field):
+    if val is None: return None
+    out = []
+    for r in val:
+        if isinstance(r, int): r = (r, r)
+        if (not isinstance(r, (list, tuple)) or len(r) != 2
+                or not all(isinstance(x, int) for x in r) or r[0] > r[1]):
+            raise ValueError(f"{field} must be a list of [start, end] line ranges")
+        out.append((r[0], r[1]))
+    return tuple(out)
@@ -0,0 +1,201 @@
+# snapshots.py — TraceDS delta-encoded container snapshots
+#
+# Instead of deep-copying every list / dict local after every statement we keep
+# one base copy per variable name and record the structural edits that turn
+# the previous state into the current one.  Every `keyframe_every` steps a full
+# copy is stored so any frame can be rebuilt without replaying the whole trace.
+# In delta mode the per-step edits are what goes on the wire instead of the
+# full containers.
+
+import copy
+
+# op codes (kept short, they end up on the wire in delta mode)
+SET, INS, DEL, RESET = "set", "ins", "del", "reset"
+
+
+# ───────────────────────────────────────────────────────────
+#  structural diffs
+# ───────────────────────────────────────────────────────────
+def same(a, b) -> bool:
+    """`a == b` with matching types all the way down, so `0` → `0.0` or
+    `1` → `True` still count as changes."""
+    if type(a) is not type(b) or a != b: return False
+    if isinstance(a, (list, tuple)):
+        return all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return all(same(k, l) and same(v, w) for (k, v), (l, w) in zip(a.items(), b.items()))
+    return True
+
+def _match_len(old, new) -> int:
+    """Length of the common prefix of two lists under `same`."""
+    n, p = min(len(old), len(new)), 0
+    while p < n and old[p] == new[p]: p += 1
+    # `==` matched the run; recheck its types in bulk, element by element
+    # only if the types differ or there is nesting to look into
+    types = list(map(type, old[:p]))
+    if types == list(map(type, new[:p])) and not any(issubclass(t, (list, tuple, dict))
+                                                     for t in set(types)):
+        return p
+    i = 0
+    while i < p and same(old[i], new[i]): i += 1
+    return i
+
+def diff_list(old: list, new: list) -> list:
+    """Index ops turning `old` into `new` (trim common prefix/suffix first)."""
+    lo, ln = len(old), len(new)
+    p = _match_len(old, new)
+    s = _match_len(old[p:][::-1], new[p:][::-1])
+
+    ops, o_mid, n_mid = [], lo - p - s, ln - p - s
+    for k in range(min(o_mid, n_mid)):
+        ops.append((SET, p + k, copy.deepcopy(new[p + k])))
+    for k in range(n_mid - o_mid):                      # grew → insert
+        i = p + o_mid + k
+        ops.append((INS, i, copy.deepcopy(new[i])))
+    for _ in range(o_mid - n_mid):                      # shrank → delete
+        ops.append((DEL, p + n_mid))
+    # an op is a few times the size of an element: past half the list it is
+    # cheaper to ship the whole thing
+    if len(ops) > max(1, ln // 2):
+        return [(RESET, copy.deepcopy(new))]
+    return ops
+
+def diff_dict(old: dict, new: dict) -> list:
+    """Key ops turning `old` into `new`; falls back to a reset if order moved."""
+    ops = [(DEL, k) for k in old if k not in new]
+    for k, v in new.items():
+        if k not in old or not same(old[k], v):
+            ops.append((SET, k, copy.deepcopy(v)))
+    # a key deleted and re-added between two steps keeps its value but moves
+    # to the end — detect that and ship the whole dict instead
+    kept = [k for k in old if k in new] + [k for k in new if k not in old]
+    if kept != list(new):
+        return [(RESET, copy.deepcopy(new))]
+    return ops
+
+def apply_ops(state, ops):
+    """Apply ops in place (or return the replacement for a reset)."""
+    for op in ops:
+        kind = op[0]
+        if kind == RESET:
+            state = copy.deepcopy(op[1])
+        elif kind == SET:
+            state[op[1]] = op[2]
+        elif kind == INS:
+            state.insert(op[1], op[2])
+        elif kind == DEL:
+            del state[op[1]]
+    return state
+
+
+# ───────────────────────────────────────────────────────────
+#  snapshot store
+# ───────────────────────────────────────────────────────────
+class SnapshotStore:
+    """Records frames as container deltas and rebuilds them on demand.
+
+    `record()` is called once per step with the *live* lists/dicts; the store
+    diffs them against its own private copy so the user program can keep
+    mutating its objects.  `frame(i)` / `frames()` rebuild the classic frame
+    dicts (`lists`, `dicts`, `prims`, …) used by the frontend, `latest()`
+    returns the newest one and `latest_delta()` the newest step's ops.
+    """
+    KINDS = ("lists", "dicts")
+
+    def __init__(self, keyframe_every: int = 64, history: bool = True):
+        self.keyframe_every = max(1, keyframe_every)
+        self.history = history                # False → only the latest step is kept
+        self.steps = []                       # per-step delta records
+        self.keyframes = {}                   # step index → full container copies
+        self.count, self._last = 0, None
+        self._state = {k: {} for k in self.KINDS}
+
+    def __len__(self): return self.count
+
+    def record(self, line_no, lists, dicts, **extra) -> int:
+        """Store one step; `extra` holds the already-cheap parts of a frame."""
+        idx = self.count
+        live = {"lists": lists, "dicts": dicts}
+        step = {"line_no": line_no, "extra": extra}
+
+        for kind in self.KINDS:
+            prev, cur, deltas = self._state[kind], live[kind], {}
+            for name, val in cur.items():
+                if name not in prev:
+                    deltas[name] = [(RESET, copy.deepcopy(val))]
+                    prev[name] = copy.deepcopy(val)
+                    continue
+                ops = (diff_list if kind == "lists" else diff_dict)(prev[name], val)
+                if ops:
+                    deltas[name] = ops
+                    prev[name] = apply_ops(prev[name], ops)
+            step[kind] = deltas
+            step[kind + "_present"] = list(cur)     # keeps frame key order too
+
+        self.count, self._last = idx + 1, step
+        if not self.history: return idx
+        if idx % self.keyframe_every == 0:
+            self.keyframes[idx] = {k: copy.deepcopy(self._state[k]) for k in self.KINDS}
+        self.steps.append(step)
+        return idx
+
+    # ── reconstruction ────────────────────────────────────
+    def _state_at(self, i):
+        k = i - i % self.keyframe_every
+        state = copy.deepcopy(self.keyframes[k])
+        for j in range(k + 1, i + 1):
+            self._replay(state, self.steps[j])
+        return state
+
+    def _replay(self, state, step):
+        for kind in self.KINDS:
+            for name, ops in step[kind].items():
+                state[kind][name] = apply_ops(state[kind].get(name), ops)
+
+    def _view(self, state, step):
+        # elements are only ever replaced (never mutated in place) by the ops,
+        # so a shallow copy per container is enough to freeze a frame
+        return {"line_no": step["line_no"],
+                "lists": {n: list(state["lists"][n]) for n in step["lists_present"]},
+                "dicts": {n: dict(state["dicts"][n]) for n in step["dicts_present"]},
+                **step["extra"]}
+
+    def frame(self, i: int) -> dict:
+        """Rebuild frame `i` from the nearest keyframe at or before it."""
+        if not self.history: raise ValueError("frame() needs history=True")
+        if i < 0: i += len(self.steps)
+        if not 0 <= i < len(self.steps): raise IndexError(i)
+        return self._view(self._state_at(i), self.steps[i])
+
+    def frames(self, start: int = 0):
+        """Yield every frame from `start` on, replaying deltas incrementally."""
+        if start >= len(self.steps): return
+        state = self._state_at(start)
+        yield self._view(state, self.steps[start])
+        for j in range(start + 1, len(self.steps)):
+            self._replay(state, self.steps[j])
+            yield self._view(state, self.steps[j])
+
+    def deltas(self) -> dict:
+        """The raw delta encoding (base keyframes + per-step ops)."""
+        return {"keyframe_every": self.keyframe_every,
+                "keyframes": self.keyframes, "steps": self.steps}
+
+    def latest(self) -> dict:
+        """The most recent frame, straight from the running state."""
+        return self._view(self._state, self._last)
+
+    def latest_delta(self) -> dict:
+        """The most recent step as it goes on the wire in delta mode.
+
+        `lists` / `dicts` map every variable present at that step to the ops
+        that bring the reader's copy up to date (`[]` when unchanged); see
+        `apply_ops` and frontend/src/traceCodec.js.
+        """
+        step = self._last
+        out = {"line_no": step["line_no"]}
+        for kind in self.KINDS:
+            ops = step[kind]
+            out[kind] = {n: ops.get(n, ()) for n in step[kind + "_present"]}
+        out.update(step["extra"])
+        return out
@@ -0,0 +1,122 @@
+# test_cache.py — TraceCache tiers and single flight
+import threading, time
+
+from cache import TraceCache, cache_key, is_deterministic
+
+DONE = ['{"frame":{"line_no":1}}\n', '{"done":true,"frames":1,"complexity":"O(1)"}\n']
+TIMEOUT = ['{"error":"Time limit exceeded (5s)","line":null,"limit":"time"}\n']
+
+
+class Busy(Exception):
+    pass
+
+
+def counting(lines, gate=None):
+    """A `produce` that counts its calls and optionally waits on `gate`."""
+    calls = []
+    def produce():
+        calls.append(1)
+        def gen():
+            if gate is not None: gate.wait(5)
+            yield from lines
+        return gen()
+    return produce, calls
+
+def wait_for(cond, timeout=5):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+
+def test_key_ignores_trailing_whitespace_but_not_options():
+    assert cache_key("x = 1  \r\n\n") == cache_key("x = 1\n")
+    assert cache_key("x = 1", {"engine": "ast"}) != cache_key("x = 1", {"engine": "monitoring"})
+
+def test_is_deterministic():
+    assert is_deterministic("a = [3, 1]\na.sort()")
+    assert not is_deterministic("import random\nx = random.random()")
+    assert not is_deterministic("s = {1, 2}")
+    assert is_deterministic("def f(:")         # the SyntaxError is stable too
+
+def test_miss_then_memory_hit():
+    cache = TraceCache()
+    produce, calls = counting(DONE)
+    assert list(cache.open("k", produce)) == DONE
+    assert list(cache.open("k", produce)) == DONE
+    assert len(calls) == 1
+    assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    TraceCache(directory=str(tmp_path)).put("k", DONE)
+    cache = TraceCache(directory=str(tmp_path))
+    assert cache.get("k") == tuple(DONE)
+    assert cache.stats["disk_hits"] == 1
+
+def test_memory_lru_evicts_oldest():
+    size = sum(len(l) for l in DONE)
+    cache = TraceCache(max_bytes=2 * size)
+    for key in "abc": cache.put(key, DONE)
+    assert cache.get("a") is None and cache.get("c") is not None
+    assert cache.stats["evictions"] == 1
+
+def test_pool_limits_are_not_cached():
+    cache = TraceCache()
+    produce, calls = counting(TIMEOUT)
+    list(cache.open("k", produce)); list(cache.open("k", produce))
+    assert len(calls) == 2
+
+def test_identical_requests_coalesce():
+    cache, gate, results = TraceCache(), threading.Event(), []
+    produce, calls = counting(DONE, gate)
+    leader = cache.open("k", produce)
+    followers = [threading.Thread(target=lambda: results.append(list(cache.open("k", produce))))
+                 for _ in range(3)]
+    for t in followers: t.start()
+    wait_for(lambda: cache.stats["coalesced"] == 3)
+    gate.set()
+    assert list(leader) == DONE
+    for t in followers: t.join(5)
+    assert results == [DONE] * 3 and len(calls) == 1
+
+def test_followers_share_an_uncacheable_result():
+    # e.g. a timeout: every waiting request gets it, none re-runs the program
+    cache, gate, results = TraceCache(), threading.Event(), []
+    produce, calls = counting(TIMEOUT, gate)
+    leader = cache.open("k", produce)
+    followers = [threading.Thread(target=lambda: results.append(list(cache.open("k", produce))))
+                 for _ in range(3)]
+    for t in followers: t.start()
+    wait_for(lambda: cache.stats["coalesced"] == 3)
+    gate.set(); list(leader)
+    for t in followers: t.join(5)
+    assert results == [TIMEOUT] * 3 and len(calls) == 1
+    assert cache.get("k") is None
+
+def test_cancelled_leader_hands_over_to_one_follower():
+    cache, gate, results = TraceCache(), threading.Event(), []
+    produce, calls = counting(DONE, gate)
+    leader = iter(cache.open("k", produce))
+    followers = [threading.Thread(target=lambda: results.append(list(cache.open("k", produce))))
+                 for _ in range(3)]
+    for t in followers: t.start()
+    wait_for(lambda: cache.stats["coalesced"] == 3)
+    leader.close()                          # client went away mid-trace
+    wait_for(lambda: len(calls) == 2)
+    gate.set()
+    for t in followers: t.join(5)
+    assert results == [DONE] * 3 and len(calls) == 2
+
+def test_follower_rerun_errors_raise_from_open():
+    cache, gate = TraceCache(), threading.Event()
+    produce, _ = counting(DONE, gate)
+    leader, raised = iter(cache.open("k", produce)), []
+    def busy(): raise Busy()
+    def follow():
+        try: cache.open("k", busy)
+        except Busy: raised.append(True)
+    t = threading.Thread(target=follow); t.start()
+    wait_for(lambda: cache.stats["coalesced"] == 1)
+    leader.close()
+    t.join(5)
+    assert raised == [True]
@@ -0,0 +1,63 @@
+# test_compact.py — columnar trace encoding round trip
+import base64, gzip, json
+from array import array
+
+import pytest
+from werkzeug.http import parse_accept_header
+
+import bench
+from compact import collect_compact, compress, pick_encoding
+from executor import collect
+from tracer import iter_trace
+
+
+def decode(payload):
+    """Python twin of frontend/src/traceCodec.js."""
+    lines = array("i"); lines.frombytes(base64.b64decode(payload["line_no"]))
+    frames = [{"line_no": l, "heap": {}} for l in lines]
+    for col, vars_ in payload["columns"].items():
+        for f in frames: f[col] = {}
+        for name, runs in vars_.items():
+            start = 0
+            for r in range(0, len(runs), 2):
+                start += runs[r]
+                end = start + runs[r + 2] if r + 2 < len(runs) else len(frames)
+                if runs[r + 1] < 0: continue
+                for i in range(start, end): frames[i][col][name] = payload["values"][runs[r + 1]]
+    for i, heap in payload["heap"]: frames[i]["heap"] = heap
+    return frames
+
+def both(code, **opts):
+    lines = list(iter_trace(code, encode=True, **opts))
+    classic, err1 = collect(lines)
+    compact, err2 = collect_compact(lines)
+    assert err1 == err2
+    return (json.loads(classic) if classic else None), (json.loads(compact) if compact else None)
+
+
+@pytest.mark.parametrize("name", sorted(bench.CORPUS))
+def test_round_trip_matches_classic_body(name):
+    classic, compact = both(bench.CORPUS[name].format(n=20))
+    assert decode(compact) == classic["frames"]
+    assert compact["complexity"] == classic["complexity"]
+
+def test_values_keep_their_types():
+    classic, compact = both("x = [0]\nx[0] = 0.0\nd = {'a': 1}\nd['a'] = True\n")
+    frames = decode(compact)
+    assert repr(frames[1]["lists"]["x"]) == "[0.0]" and frames[3]["dicts"]["d"]["a"] is True
+
+def test_variables_can_disappear_and_return():
+    code = "def f():\n    t = 1\n    return t\n\nf()\nf()\n"
+    classic, compact = both(code)
+    assert decode(compact) == classic["frames"]
+    assert -1 in compact["columns"]["prims"]["t"][1::2]
+
+def test_truncation_and_errors_carry_over():
+    classic, compact = both("x = 0\nwhile True:\n    x += 1\n", max_frames=10)
+    assert compact["truncated"] == classic["truncated"] and compact["length"] == 10
+    assert both("1 / 0\n") == (None, None)
+
+def test_encoding_negotiation():
+    assert pick_encoding(parse_accept_header("gzip, deflate")) == "gzip"
+    assert pick_encoding(parse_accept_header("identity")) is None
+    assert gzip.decompress(compress(b"x" * 2000, "gzip")) == b"x" * 2000
@@ -0,0 +1,94 @@
+# test_empirical.py — measured complexity: target choice, fitting, sampling
+import math
+
+import pytest
+
+from empirical import choose_target, estimate, fit_growth, iter_measure
+
+SIZES = (8, 16, 32, 64, 128, 256, 512)
+
+QUICK_SORT = """def partition(arr, low, high):
+    pivot = arr[high]
+    i = low - 1
+    for j in range(low, high):
+        if arr[j] <= pivot:
+            i += 1
+            arr[i], arr[j] = arr[j], arr[i]
+    arr[i + 1], arr[high] = arr[high], arr[i + 1]
+    return i + 1
+
+def quick_sort(arr, low, high):
+    if low < high:
+        p = partition(arr, low, high)
+        quick_sort(arr, low, p - 1)
+        quick_sort(arr, p + 1, high)
+
+arr = [5, 2, 9, 1]
+quick_sort(arr, 0, len(arr) - 1)
+"""
+
+
+class _Job(list):
+    def close(self): pass
+
+def submit(code, opts):
+    """In-process stand-in for `TracePool.submit`."""
+    opts = dict(opts); opts.pop("mode")
+    return _Job(iter_measure(code, encode=True, **opts))
+
+def series(f, sizes=SIZES):
+    return [{"n": n, "ops": f(n)} for n in sizes]
+
+
+@pytest.mark.parametrize("code, target", [
+    ("def f(arr):\n    return sorted(arr)\n\nf([3, 1])\n", ("f", "list", [])),
+    ("def fib(n):\n    return n\n", ("fib", "int", [])),
+    ("def walk(h):\n    while h: h = h.next\n", ("walk", "linked", [])),
+    ("def binary_search(a, t):\n    pass\n\nbinary_search([1, 2], 2)\n",
+     ("binary_search", "sorted_list", [["mid"]])),
+    (QUICK_SORT, ("quick_sort", "list", [["value", 0], ["len", -1]])),
+    (QUICK_SORT.replace("0, len(arr) - 1", "0, 3"), ("quick_sort", "list", [["value", 0], ["len", -1]])),
+    (QUICK_SORT.replace("quick_sort(arr, 0, len(arr) - 1)", "n = len(arr)\nquick_sort(arr, low=0, high=n - 1)"),
+     ("quick_sort", "list", [["value", 0], ["len", -1]])),
+])
+def test_choose_target(code, target):
+    assert choose_target(code) == target
+
+def test_choose_target_errors():
+    with pytest.raises(ValueError): choose_target("def f(:\n")
+    with pytest.raises(ValueError): choose_target("x = 1\n")
+    with pytest.raises(ValueError): choose_target("def f(a): pass\n", function="g")
+    with pytest.raises(ValueError): choose_target("def f(a): pass\n", input="queue")
+
+@pytest.mark.parametrize("f, expected", [
+    (lambda n: 5, "O(1)"),
+    (lambda n: 3 * math.log2(n) + 2, "O(log n)"),
+    (lambda n: 4 * n + 7, "O(n)"),
+    (lambda n: 2 * n * math.log2(n) + n, "O(n log n)"),
+    (lambda n: n * n // 2 + 3 * n, "O(n^2)"),
+])
+def test_fit_growth(f, expected):
+    fit = fit_growth(series(f))
+    assert fit["complexity"] == expected and fit["confidence"] > 0.5
+
+def test_fit_growth_exponential():
+    assert fit_growth(series(lambda n: 3 * 2 ** n, (4, 8, 12, 16, 20, 24)))["complexity"] == "O(2^n)"
+
+def test_iter_measure_counts_work():
+    code = "def total(arr):\n    s = 0\n    for x in arr:\n        s += x\n    return s\n"
+    ops = [next(iter_measure(code, n, "total", "list"))["sample"]["ops"] for n in (10, 20)]
+    assert ops[1] - ops[0] == 20               # two lines per element
+
+def test_iter_measure_time_limit():
+    code = "def spin(n):\n    while True:\n        n += 1\n"
+    ev = next(iter_measure(code, 4, "spin", "int", time_limit=0.05))
+    assert ev["limit"] == "time"
+
+def test_quick_sort_bounds_come_from_the_call_site():
+    out = estimate(submit, QUICK_SORT)
+    assert out["complexity"] in ("O(n log n)", "O(n^2)") and "warning" not in out
+
+def test_flat_cost_with_guessed_arguments_is_not_trusted():
+    out = estimate(submit, QUICK_SORT.replace("quick_sort(arr, 0, len(arr) - 1)\n", ""),
+                   function="quick_sort")
+    assert out["complexity"] == "O(1)" and out["confidence"] == 0.0 and out["warning"]
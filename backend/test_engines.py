@@ -0,0 +1,107 @@
+# test_engines.py — ast / monitoring engine parity
+#
+# The engines do not emit identical frame sequences: `ast` reports a
+# compound statement once its body has run, `monitoring` reports lines as
+# they start and also sees returns and comprehensions.  What must agree is
+# the data: every state `ast` shows, `monitoring` shows too, and both end in
+# the same state.  Checks that only need the `ast` engine run everywhere.
+import pytest
+
+import bench
+from engines import ENGINES
+from heap import materialize
+from tracer import trace_code
+
+needs_monitoring = pytest.mark.skipif(not ENGINES["monitoring"].available,
+                                      reason="the monitoring engine needs Python 3.12+")
+BOTH = ["ast", pytest.param("monitoring", marks=needs_monitoring)]
+
+METHODS = """class A:
+    def m(self):
+        x = 1
+        return x
+
+def g():
+    y = 2
+    return y
+
+a = A()
+a.m()
+g()
+"""
+
+# nested loops, where the outer body starts with the inner loop's own line
+LOOPS = """def bubble(a):
+    n = len(a)
+    for i in range(n):
+        for j in range(n - i - 1):
+            if a[j] > a[j + 1]:
+                a[j], a[j + 1] = a[j + 1], a[j]
+    return a
+
+bubble([3, 1, 2])
+k = 0
+while True:
+    for j in range(2):
+        if j: break
+    k += 1
+    if k == 2: break
+"""
+
+
+def states(code, engine):
+    out = []
+    for f in materialize(trace_code(code, engine=engine)["frames"]):
+        state = repr((f["lists"], f["dicts"], f["linked"], f["trees"]))
+        if not out or out[-1] != state: out.append(state)
+    return out
+
+def lines(code, engine, select):
+    return {f["line_no"] for f in trace_code(code, engine=engine, select=select)["frames"]}
+
+
+@needs_monitoring
+@pytest.mark.parametrize("name", sorted(bench.CORPUS))
+def test_monitoring_sees_every_ast_state(name):
+    code = bench.CORPUS[name].format(n=12)
+    ast_states, mon_states = states(code, "ast"), states(code, "monitoring")
+    assert set(ast_states) <= set(mon_states)
+    assert ast_states[-1] == mon_states[-1]
+
+@pytest.mark.parametrize("select, traced, skipped", [
+    ({"functions": ["A"]},         {3},        {7, 10, 11, 12}),
+    ({"exclude_functions": ["A"]}, {7, 10, 11}, {3}),
+    ({"functions": ["g"]},         {7},        {3, 10}),
+])
+@pytest.mark.parametrize("engine", BOTH)
+def test_same_scope_on_both_engines(engine, select, traced, skipped):
+    seen = lines(METHODS, engine, select)
+    assert traced <= seen and not skipped & seen
+
+@pytest.mark.parametrize("engine", BOTH)
+def test_one_frame_per_loop_iteration(engine):
+    frames = trace_code(LOOPS, engine=engine, select={"granularity": "loop"})["frames"]
+    assert [f["line_no"] for f in frames] == [3, 4, 4, 3, 4, 3, 11, 12, 12, 11, 12, 12]
+
+@needs_monitoring
+def test_same_loop_frames_on_both_engines():
+    select = {"granularity": "loop"}
+    ast_frames, mon_frames = (trace_code(LOOPS, engine=e, select=select)["frames"]
+                              for e in ("ast", "monitoring"))
+    assert ([(f["line_no"], f["prims"]) for f in mon_frames]
+            == [(f["line_no"], f["prims"]) for f in ast_frames])
+
+@needs_monitoring
+def test_stdlib_generated_code_is_not_traced():
+    # dataclass methods are exec()-generated, with a filename of their own
+    code = ("from dataclasses import dataclass\n\n@dataclass\nclass P:\n    x: int\n    y: int\n\n"
+            "p = P(1, 2)\nq = P(1, 2)\nsame = p == q\n")
+    seen = [f["line_no"] for f in trace_code(code, engine="monitoring")["frames"]]
+    assert seen[-3:] == [8, 9, 10] and set(seen) <= {1, 3, 4, 5, 6, 8, 9, 10}
+
+@pytest.mark.parametrize("select", [{"granularity": "call"}, {"sample_every": 2}, {}])
+@pytest.mark.parametrize("engine", BOTH)
+def test_docstrings_survive_call_hooks(engine, select):
+    code = 'def f():\n    """doc"""\n    return 1\n\ndef g():\n    d = f.__doc__\n    return d\n\ng()\n'
+    frames = trace_code(code, engine=engine, select=select)["frames"]
+    assert {f["prims"]["d"] for f in frames if "d" in f["prims"]} == {"doc"}
@@ -0,0 +1,111 @@
+# test_heap.py — interned heap graph and dirty tracking
+from heap import HeapTable
+from tracer import trace_code
+
+
+class T:
+    def __init__(self, val):
+        self.val, self.left, self.right = val, None, None
+
+
+class Slotted:
+    __slots__ = ("val", "next", "extra")
+    def __init__(self, val):
+        self.val, self.next = val, None
+
+
+class Guarded:
+    """Has its own __setattr__, which close() must put back."""
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value.upper() if isinstance(value, str) else value)
+
+
+def test_nodes_in_list_and_dict_locals_become_refs():
+    code = ("class T:\n    def __init__(self, v): self.val, self.left = v, None\n"
+            "root = T(1); root.left = T(2)\n"
+            "q = [root]\nseen = {}\n"
+            "while q:\n    n = q.pop(0)\n    seen[n.val] = n\n"
+            "    if n.left: q.append(n.left)\n")
+    frames = trace_code(code)["frames"]
+    queues = [f["lists"]["q"] for f in frames if "q" in f["lists"]]
+    assert [{"ref": 1}] in queues and [{"ref": 2}] in queues
+    assert frames[-1]["dicts"]["seen"] == {1: {"ref": 1}, 2: {"ref": 2}}
+    assert " at 0x" not in repr(frames)
+
+def test_plain_containers_are_passed_through():
+    heap, arr = HeapTable(), [1, "a", None, [2.0]]
+    assert heap.encode(arr) is arr
+
+def test_encode_keeps_container_shape():
+    heap, a, b = HeapTable(), T(1), T(2)
+    try:
+        enc = heap.encode([a, (b, 3), {"k": [a]}])
+        assert enc == [{"ref": 1}, ({"ref": 2}, 3), {"k": [{"ref": 1}]}]
+        _, changed = heap.step({})
+        assert sorted(changed) == [1, 2]       # records for nodes found in containers
+    finally:
+        heap.close()
+
+def test_ids_are_stable_and_only_changes_are_emitted():
+    heap, a, b = HeapTable(), T(1), T(2)
+    try:
+        refs, changed = heap.step({"a": a})
+        assert refs == {"a": 1} and changed == {1: {"val": 1, "left": None, "right": None}}
+        assert heap.step({"a": a}) == ({"a": 1}, {})           # nothing changed
+        a.left = b
+        refs, changed = heap.step({"a": a})
+        assert changed == {1: {"val": 1, "left": {"ref": 2}, "right": None},
+                           2: {"val": 2, "left": None, "right": None}}
+        b.val = 2                                               # same value: no record
+        assert heap.step({"a": a, "b": b}) == ({"a": 1, "b": 2}, {})
+        b.val = 2.0                                             # same ==, other type
+        assert heap.step({"a": a})[1] == {2: {"val": 2.0, "left": None, "right": None}}
+    finally:
+        heap.close()
+
+def test_slotted_nodes_are_tracked():
+    heap, head = HeapTable(), Slotted(1)
+    head.next = Slotted(2)
+    try:
+        refs, changed = heap.step({"head": head})
+        # `extra` was never assigned, so it is left out
+        assert changed == {1: {"val": 1, "next": {"ref": 2}}, 2: {"val": 2, "next": None}}
+        head.next.val = 5
+        assert heap.step({"head": head})[1] == {2: {"val": 5, "next": None}}
+    finally:
+        heap.close()
+
+def test_cycles_terminate():
+    heap, a, b = HeapTable(), T(1), T(2)
+    a.left, b.left, a.right = b, a, a
+    try:
+        refs, changed = heap.step({"a": a})
+        assert changed[1]["left"] == {"ref": 2} and changed[2]["left"] == {"ref": 1}
+        assert changed[1]["right"] == {"ref": 1}
+    finally:
+        heap.close()
+
+def test_container_attributes_are_polled():
+    heap, trie, child = HeapTable(), T("root"), T("c")
+    trie.kids = {}
+    try:
+        heap.step({"trie": trie})
+        trie.kids["c"] = child                  # no __setattr__ involved
+        changed = heap.step({"trie": trie})[1]
+        assert changed[1]["kids"] == {"dict": [["c", {"ref": 2}]]} and 2 in changed
+        trie.kids["c"].val = "d"
+        assert heap.step({"trie": trie})[1] == {2: {"val": "d", "left": None, "right": None}}
+    finally:
+        heap.close()
+
+def test_close_restores_setattr():
+    heap, t, g = HeapTable(), T(1), Guarded()
+    g.name = "x"
+    heap.step({"t": t, "g": g})
+    assert "__setattr__" in T.__dict__ and "__setattr__" in vars(Guarded)
+    patched = Guarded.__setattr__
+    heap.close()
+    assert "__setattr__" not in T.__dict__
+    assert Guarded.__setattr__ is not patched
+    g.name = "y"
+    assert g.name == "Y"                     # the class's own hook runs again
@@ -0,0 +1,68 @@
+# test_selection.py — watch lists, scopes, granularity and sampling (ast engine)
+import pytest
+
+from selection import Selection
+from tracer import trace_code
+
+CODE = """def inner(a):
+    t = a * 2
+    return t
+
+def outer(xs):
+    total = 0
+    for x in xs:
+        total += inner(x)
+    return total
+
+nums = [1, 2, 3]
+res = outer(nums)
+"""
+
+
+def frames(select, code=CODE):
+    return trace_code(code, select=select)["frames"]
+
+def lines(select, code=CODE):
+    return [f["line_no"] for f in frames(select, code)]
+
+
+@pytest.mark.parametrize("bad", [
+    {"granularity": "token"}, {"sample_every": 0}, {"sample_every": 1.5},
+    {"lines": [[5, 2]]}, {"lines": ["1-3"]}, {"watch": [1]},
+])
+def test_invalid_options_raise(bad):
+    with pytest.raises(ValueError): Selection.from_dict(bad)
+
+def test_dict_round_trip_and_compile_key():
+    sel = Selection.from_dict({"watch": "arr", "lines": [4, [6, 9]], "sample_every": 3, "code": "…"})
+    assert sel.to_dict() == {"granularity": "line", "sample_every": 3, "watch": ["arr"],
+                             "lines": [[4, 4], [6, 9]]}
+    assert Selection.from_dict(sel.to_dict()).to_dict() == sel.to_dict()
+    # watch lists and sampling do not change the instrumented code ...
+    assert Selection(watch=["x"], sample_every=2).compile_key() == Selection(sample_every=3).compile_key()
+    # ... but call hooks do
+    assert Selection(sample_every=2).compile_key() != Selection().compile_key()
+
+def test_watch_keeps_only_named_locals():
+    for f in frames({"watch": ["nums", "total"]}):
+        assert set(f["prims"]) | set(f["lists"]) <= {"nums", "total"}
+    assert any("total" in f["prims"] for f in frames({"watch": ["total"]}))
+
+def test_line_ranges():
+    assert set(lines({"lines": [[6, 8]]})) <= {6, 7, 8}
+    assert not {2, 3} & set(lines({"exclude_lines": [[1, 3]]}))
+
+def test_function_scope_follows_nesting():
+    code = "def f():\n    def g():\n        y = 1\n    x = 0\n    g()\n\nf()\nz = 2\n"
+    assert set(lines({"functions": ["f"]}, code)) == {2, 3, 4, 5}
+    assert set(lines({"exclude_functions": ["f"]}, code)) == {1, 7, 8}
+
+def test_call_granularity_keeps_entries_and_returns():
+    assert lines({"granularity": "call"}) == [5, 1, 3, 1, 3, 1, 3, 9]
+
+def test_sampling_keeps_calls_and_returns():
+    calls = (1, 3, 5, 9)            # def / return lines of inner() and outer()
+    every, sampled = lines({}), lines({"sample_every": 4})
+    assert sampled.count(3) == 3                  # every return of inner()
+    assert sampled.count(5) == sampled.count(9) == 1
+    assert len([l for l in sampled if l not in calls]) < len([l for l in every if l not in calls])
@@ -0,0 +1,70 @@
+# test_snapshots.py — container diffs, keyframes and delta frames
+import copy
+
+import pytest
+
+import bench
+from snapshots import RESET, SnapshotStore, apply_ops, diff_dict, diff_list, same
+from tracer import iter_trace
+
+
+def replay(frames):
+    """Python twin of `createDeltaDecoder` in frontend/src/traceCodec.js."""
+    state = {"lists": {}, "dicts": {}}
+    for f in frames:
+        f = dict(f)
+        for kind in ("lists", "dicts"):
+            view = {}
+            for name, ops in f[kind].items():
+                if ops:
+                    state[kind][name] = apply_ops(copy.deepcopy(state[kind].get(name)), ops)
+                view[name] = state[kind][name]
+            f[kind] = copy.deepcopy(view)
+        yield f
+
+
+@pytest.mark.parametrize("old, new", [
+    ([1, 2, 3], [1, 2, 3]),
+    ([1, 2, 3], [1, 9, 3]),
+    ([1, 2, 3], [1, 2, 4, 3]),
+    ([1, 2, 3], [3]),
+    ([], [[1], [2]]),
+    ([0, 1], [0.0, True]),
+])
+def test_list_ops_rebuild_the_new_list(old, new):
+    ops = diff_list(old, new)
+    assert same(apply_ops(copy.deepcopy(old), ops), new)
+    assert bool(ops) != same(old, new)
+
+def test_dict_ops_keep_key_order():
+    old = {"a": 1, "b": 2}
+    assert apply_ops(dict(old), diff_dict(old, {"a": 1, "b": 3, "c": 4})) == {"a": 1, "b": 3, "c": 4}
+    moved = {"b": 2, "a": 1}
+    ops = diff_dict(old, moved)
+    assert ops[0][0] == RESET and list(apply_ops(dict(old), ops)) == ["b", "a"]
+
+def test_frames_rebuild_from_keyframes():
+    store, live, seen = SnapshotStore(keyframe_every=4), [], []
+    for i in range(11):
+        live.append(i)
+        if i % 3 == 0: live[0] = -i
+        store.record(i, {"arr": live}, {"d": {"n": i}}, prims={"i": i})
+        seen.append(store.latest())
+    assert sorted(store.keyframes) == [0, 4, 8]
+    assert [store.frame(i) for i in range(11)] == seen == list(store.frames())
+    assert store.frame(-1) == seen[-1] and list(store.frames(5)) == seen[5:]
+    with pytest.raises(IndexError): store.frame(11)
+
+def test_frames_are_frozen():
+    store, live = SnapshotStore(), [1, 2]
+    store.record(1, {"arr": live}, {}); first = store.latest()
+    live[0] = 9
+    store.record(2, {"arr": live}, {})
+    assert first["lists"]["arr"] == [1, 2] and store.frame(0) == first
+
+@pytest.mark.parametrize("name", sorted(bench.CORPUS))
+def test_delta_frames_replay_to_full_frames(name):
+    code = bench.CORPUS[name].format(n=20)
+    full = [e["frame"] for e in iter_trace(code) if "frame" in e]
+    deltas = [e["frame"] for e in iter_trace(code, deltas=True) if "frame" in e]
+    assert list(replay(deltas)) == full
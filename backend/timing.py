@@ -0,0 +1,32 @@
+# timing.py — TraceDS per-phase wall-clock accounting
+
+import time
+from contextlib import contextmanager
+
+PHASES = ("parse", "instrument", "compile", "exec", "snapshot", "queue_wait",
+          "serialize", "complexity")
+
+
+class PhaseTimer:
+    """Sums wall time per phase; a disabled timer costs (almost) nothing."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.totals = dict.fromkeys(PHASES, 0.0)
+
+    def add(self, name: str, seconds: float):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield; return
+        t = time.perf_counter()
+        try: yield
+        finally: self.add(name, time.perf_counter() - t)
+
+    def report(self) -> dict:
+        """Milliseconds per phase."""
+        return {k: round(v * 1000, 3) for k, v in self.totals.items()}
+
+NULL_TIMER = PhaseTimer(enabled=False)
@@ -1,6 +1,14 @@
 # tracer.py — TraceDS (with pointer tracking)
 
-import ast, copy, inspect
+import ast, json, queue, threading, time, traceback
+from engines import ENGINES, FILENAME, compile_cached
+from heap import HeapTable, is_node
+from selection import Selection
+from timing import PhaseTimer
+from snapshots import SnapshotStore
+
+# bump whenever the frame format or tracing semantics change (cache keys use it)
+TRACER_VERSION = "8"
 
 # ───────────────────────────────────────────────────────────
 #  lightweight complexity heuristics
@@ -79,76 +87,163 @@ def estimate_complexity(code: str) -> str:
 # ───────────────────────────────────────────────────────────
 #  dynamic trace that tracks variables
 # ───────────────────────────────────────────────────────────
-def trace_code(code_str: str) -> dict:
-    frames, current_line = [], [0]
-    def __trace_line__(lineno): current_line[0] = lineno
+class TraceStopped(BaseException):
+    """Raised inside the traced program to unwind it (budget hit / cancelled).
+
+    Derives from BaseException so a bare `except Exception` in user code
+    cannot swallow it.
+    """
+
+def encode_event(event: dict) -> str:
+    return json.dumps(event, default=repr, separators=(",", ":")) + "\n"
+
+def _error_line(exc):
+    if isinstance(exc, SyntaxError): return exc.lineno
+    lines = [f.lineno for f in traceback.extract_tb(exc.__traceback__) if f.filename == FILENAME]
+    return lines[-1] if lines else None
+
+def iter_trace(code_str: str, max_frames: int = None, max_bytes: int = None,
+               encode: bool = False, max_steps: int = None, engine: str = "ast",
+               select: dict = None, timings: bool = False, deltas: bool = False):
+    """Run `code_str` and yield trace events while it executes.
 
-    def snapshot():
+    Events are `{"frame": …}` per step, an optional `{"truncated": …}` marker
+    when a frame/byte/step budget is hit, then `{"done": True, "complexity": …}`.
+    With `encode=True` every event is yielded as one NDJSON line and program
+    errors become an `{"error": …, "line": …}` event instead of raising.
+    `engine` picks the tracing backend (see engines.py) and `select` narrows
+    what is traced (see selection.py).  `timings=True` adds per-phase
+    milliseconds to the done event.  `deltas=True` sends list / dict locals
+    as per-step ops instead of full copies (see `SnapshotStore.latest_delta`).
+    """
+    sel, timer, clock = Selection.from_dict(select or {}), PhaseTimer(timings), time.perf_counter
+    # frames leave as they are produced, so no per-step history is kept
+    store, current_line, steps, hits = SnapshotStore(history=False), [0], [0], [0]
+    heap = HeapTable()     # object ids are shared by every frame of this trace
+    events, stop = queue.Queue(maxsize=64), threading.Event()
+    def __trace_line__(lineno):
+        current_line[0] = lineno; steps[0] += 1
+        if max_steps and steps[0] > max_steps:
+            emit(("limit", "steps", max_steps)); raise TraceStopped()
+
+    def emit(item):
+        # block while the consumer is behind, but never past a cancellation
+        while True:
+            if stop.is_set(): raise TraceStopped()
+            try: events.put(item, timeout=0.1); return
+            except queue.Full: pass
+
+    def snapshot(f, force=False):
+        hits[0] += 1
+        if not force and (hits[0] - 1) % sel.sample_every: return
+        if max_frames and len(store) >= max_frames:
+            emit(("limit", "frames", max_frames)); raise TraceStopped()
+        t0 = clock() if timings else 0
         try:
-            f = inspect.currentframe().f_back
-            lists_snap, dicts_snap, prims_snap = {}, {}, {}
-            linked_snap, tree_snap = {}, {}
+            lists_snap, dicts_snap, prims_snap, roots = {}, {}, {}, {}
 
-            # locals
-            for name, val in f.f_locals.items():
+            # locals (only the watched ones when a watch list is given)
+            local_vars = f.f_locals
+            for name, val in local_vars.items():
                 if name.startswith("__"): continue
+                if sel.watch is not None and name not in sel.watch: continue
+                # containers are diffed (not copied) by the snapshot store;
+                # nodes inside them become heap refs
                 if isinstance(val, list):
-                    lists_snap[name] = copy.deepcopy(val)
+                    lists_snap[name] = heap.encode(val)
                 elif isinstance(val, dict):
-                    dicts_snap[name] = copy.deepcopy(val)
+                    dicts_snap[name] = heap.encode(val)
                 elif isinstance(val, (int,float,str,bool,type(None))):
                     prims_snap[name] = val
-                elif hasattr(val, "next"):
-                    nodes, seen, node = [], set(), val
-                    while node and id(node) not in seen:
-                        seen.add(id(node)); nodes.append(getattr(node,"val",None))
-                        node = getattr(node,"next",None)
-                    linked_snap[name] = nodes
-                elif hasattr(val,"left") or hasattr(val,"right"):
-                    def ser(n):
-                        if n is None: return None
-                        return {"id":id(n),"val":getattr(n,"val",None),
-                                "left":ser(getattr(n,"left",None)),
-                                "right":ser(getattr(n,"right",None))}
-                    tree_snap[name] = ser(val)
-
-            # pointer tracking  array->[(var,idx)…]
+                elif is_node(val):
+                    roots[name] = val
+            # objects: ids for the locals, records only for what changed
+            refs, changed = heap.step(roots)
+
+            # pointer tracking  array->[(var,idx)…], over the (watched) int locals
             array_indices={}
-            for var,val in f.f_locals.items():
+            for var,val in prims_snap.items():
                 if isinstance(val,int):
                     for arr_name,arr in lists_snap.items():
                         if 0<=val<len(arr):
                             array_indices.setdefault(arr_name,[]).append((var,val))
 
-            frames.append({
-                "line_no":current_line[0],
-                "lists":lists_snap,"dicts":dicts_snap,"prims":prims_snap,
-                "linked":linked_snap,"trees":tree_snap,
-                "array_indices":array_indices
-            })
+            store.record(current_line[0], lists_snap, dicts_snap,
+                         prims=prims_snap, refs=refs, heap=changed,
+                         array_indices=array_indices)
+            frame = store.latest_delta() if deltas else store.latest()
+        except Exception as e:
+            print("SNAPSHOT ERROR:",e); return
+        if not timings: return emit(("frame", frame))
+        t1 = clock(); emit(("frame", frame))
+        timer.add("snapshot", t1 - t0); timer.add("queue_wait", clock() - t1)
+
+    try:
+        code_obj = compile_cached(ENGINES[engine], code_str, sel, timer)
+    except SyntaxError as e:
+        if not encode: raise
+        yield encode_event({"error": str(e), "line": e.lineno}); return
+
+    def run():
+        try:
+            with timer.phase("exec"):
+                ENGINES[engine].execute(code_obj, __trace_line__, snapshot, sel)
+        except TraceStopped: pass
         except Exception as e:
-            print("SNAPSHOT ERROR:",e)
-
-    tree = ast.parse(code_str)
-    class Injector(ast.NodeTransformer):
-        def inject(self, stmts):
-            out=[]
-            for s in stmts:
-                out.append(s)
-                if hasattr(s,"lineno"):
-                    out.extend([
-                        ast.Expr(ast.Call(ast.Name("__trace_line__",ast.Load()),
-                                          [ast.Constant(s.lineno)],[])),
-                        ast.Expr(ast.Call(ast.Name("snapshot",ast.Load()),[],[])),
-                    ])
-            return out
-        def visit_Module(self,n): self.generic_visit(n); n.body=self.inject(n.body); return n
-        def visit_FunctionDef(self,n): self.generic_visit(n); n.body=self.inject(n.body); return n
-        visit_AsyncFunctionDef=visit_FunctionDef
-        visit_For=visit_FunctionDef; visit_While=visit_FunctionDef
-        visit_If=visit_FunctionDef; visit_With=visit_FunctionDef; visit_Try=visit_FunctionDef
-
-    tree=Injector().visit(tree); ast.fix_missing_locations(tree)
-    ns={"__trace_line__":__trace_line__,"snapshot":snapshot}
-    exec(compile(tree,"<string>","exec"),ns,ns)
-    return {"frames":frames,"complexity":estimate_complexity(code_str)}
+            try: emit(("error", e))
+            except TraceStopped: return
+        finally: heap.close()
+        try: emit(("end",))
+        except TraceStopped: pass
+
+    worker = threading.Thread(target=run, name="trace-exec", daemon=True)
+    worker.start()
+    count, used, truncated = 0, 0, None
+    try:
+        while True:
+            item = events.get()
+            if item[0] == "frame":
+                ev = {"frame": item[1]}
+                with timer.phase("serialize"):
+                    line = encode_event(ev) if encode or max_bytes else None
+                if max_bytes and used + len(line) > max_bytes:
+                    truncated = {"reason": "bytes", "limit": max_bytes}; break
+                count += 1
+                if line: used += len(line)
+                yield line if encode else ev
+            elif item[0] == "limit":
+                truncated = {"reason": item[1], "limit": item[2]}; break
+            elif item[0] == "error":
+                if not encode: raise item[1]
+                yield encode_event({"error": str(item[1]) or type(item[1]).__name__,
+                                    "line": _error_line(item[1])}); return
+            else:
+                break
+    finally:
+        # unblock and unwind the program if we stopped early / were closed
+        stop.set()
+        worker.join()
+
+    tail = []
+    if truncated: tail.append({"truncated": truncated})
+    with timer.phase("complexity"): complexity = estimate_complexity(code_str)
+    tail.append({"done": True, "frames": count, "complexity": complexity})
+    if timings:
+        # exec was timed around the whole run: leave only the program itself
+        t = timer.totals
+        t["exec"] = max(0.0, t["exec"] - t["snapshot"] - t["queue_wait"])
+        tail[-1]["timings"] = timer.report()
+    for ev in tail: yield encode_event(ev) if encode else ev
+
+def trace_code(code_str: str, max_frames: int = None, max_bytes: int = None,
+               engine: str = "ast", select: dict = None, timings: bool = False) -> dict:
+    """Collect a whole trace: `{"frames": [...], "complexity": ...}`."""
+    result = {"frames": []}
+    for ev in iter_trace(code_str, max_frames, max_bytes, engine=engine, select=select,
+                         timings=timings):
+        if "frame" in ev: result["frames"].append(ev["frame"])
+        elif "truncated" in ev: result["truncated"] = ev["truncated"]
+        else:
+            result["complexity"] = ev["complexity"]
+            if timings: result["timings"] = ev["timings"]
+    return result
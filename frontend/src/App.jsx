@@ -1,11 +1,69 @@
-import React, { useState, useEffect, useCallback } from 'react';
-import axios from 'axios';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import toast, { Toaster } from 'react-hot-toast';
 
 import CodeEditor from './CodeEditor';
 import DataStructureVisualizer from './DataStructureVisualizer';
+import { createHeapDecoder } from './heapView';
+import { createDeltaDecoder, decodeCompactTrace } from './traceCodec';
 import './index.css';
 
+const TRACE_URL = 'https://traceds-backend.onrender.com/trace';
+// 'stream' shows frames while the program runs; 'compact' fetches the whole
+// trace at once in the much smaller columnar format
+const TRACE_FORMAT = process.env.REACT_APP_TRACE_FORMAT || 'stream';
+
+// ─── streaming trace reader ───
+// POSTs with `stream: true` and hands every NDJSON line that arrives to
+// `onEvents` (one array per network chunk, so React batches a chunk at once).
+// Lists and dicts arrive as per-step ops (`deltas: true`), so frames have to
+// go through a delta decoder in order.
+async function streamTrace(src, onEvents, signal) {
+  const res = await fetch(TRACE_URL, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ code: src, stream: true, deltas: true }),
+    signal,
+  });
+  if (!res.ok || !res.body) {
+    const data = await res.json().catch(() => ({}));
+    throw Object.assign(new Error(data.error || 'Execution error'), { data });
+  }
+
+  const reader  = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buf += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buf.split('\n');
+    buf = done ? '' : lines.pop();
+    const events = lines.filter(l => l.trim()).map(l => JSON.parse(l));
+    if (events.length) onEvents(events);
+    if (done) break;
+  }
+}
+
+// ─── compact trace reader ───
+// same events as the stream, replayed from one columnar response (the
+// browser undoes the gzip / brotli Content-Encoding)
+async function fetchCompactTrace(src, onEvents, signal) {
+  const res = await fetch(TRACE_URL, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ code: src, format: 'compact' }),
+    signal,
+  });
+  const data = await res.json().catch(() => ({}));
+  if (!res.ok) throw Object.assign(new Error(data.error || 'Execution error'), { data });
+
+  const events = decodeCompactTrace(data).map(frame => ({ frame }));
+  if (data.truncated) events.push({ truncated: data.truncated });
+  events.push({ done: true, complexity: data.complexity });
+  onEvents(events);
+}
+
+const loadTrace = TRACE_FORMAT === 'compact' ? fetchCompactTrace : streamTrace;
+
 // ─── sorting algorithm templates ───
 const sortAlgorithms = {
   bubble: `def bubble_sort(arr):
@@ -212,6 +270,9 @@ export default function App() {
   const [lastLinkedLists, setLastLinkedLists] = useState({});
   const [lastArrays, setLastArrays]           = useState({});
 
+  // in-flight stream, aborted when a new run starts
+  const streamRef = useRef(null);
+
   // toggle dark mode
   useEffect(() => {
     document.body.classList.toggle('dark', dark);
@@ -229,15 +290,37 @@ export default function App() {
       setComplexity('');
       toast.dismiss();
 
+      streamRef.current?.abort();
+      const ctrl = new AbortController();
+      streamRef.current = ctrl;
+
+      let started = false;
+      const decodeHeap = createHeapDecoder();
+      const decodeDeltas = TRACE_FORMAT === 'compact' ? f => f : createDeltaDecoder();
+      const decode = frame => decodeHeap(decodeDeltas(frame));
+      const onEvents = (events) => {
+        if (ctrl.signal.aborted) return;
+        const batch = [];
+        for (const ev of events) {
+          if (ev.frame) batch.push(decode(ev.frame));
+          else if (ev.truncated) toast(`Trace truncated (${ev.truncated.reason} limit reached)`);
+          else if (ev.done) setComplexity(ev.complexity || 'unknown');
+          else if (ev.error) {
+            setError({ line: ev.line, msg: ev.error });
+            toast.error(`${ev.error}${ev.line ? ` (line ${ev.line})` : ''}`);
+          }
+        }
+        if (!batch.length) return;
+        setFrames(prev => prev.concat(batch));
+        // start playing as soon as the first frames are in
+        if (!started) { started = true; setPlaying(true); }
+      };
+
       try {
-        const { data } = await axios.post(
-          'https://traceds-backend.onrender.com/trace',
-          { code: src }
-        );
-        setFrames(data.frames || []);
-        setComplexity(data.complexity || 'unknown');
+        await loadTrace(src, onEvents, ctrl.signal);
       } catch (err) {
-        const d = err.response?.data || {};
+        if (err.name === 'AbortError') return;
+        const d = err.data || {};
         setError({ line: d.line, msg: d.error || 'Execution error' });
         toast.error(`${d.error || 'Execution error'}${d.line ? ` (line ${d.line})` : ''}`);
       }
@@ -311,13 +394,13 @@ print(score)
     return () => clearInterval(t);
   }, [playing, speed, frames.length]);
 
-  // snapshot fallbacks
+  // snapshot fallbacks (frames are never mutated, so no copies needed)
   useEffect(() => {
     if (!frames[idx]) return;
     if (frames[idx].lists) {
       setLastArrays(prev => ({
         ...prev,
-        ...JSON.parse(JSON.stringify(frames[idx].lists))
+        ...frames[idx].lists
       }));
     }
     if (frames[idx].linked) {
@@ -76,6 +76,7 @@ export default function DataStructureVisualizer({
           key={n}
           name={n}
           values={frame.linked?.[n] || fallbackLinked?.[n] || []}
+          ids={frame.linked?.[n] ? frame.linkedIds?.[n] : undefined}
           highlightIndex={linkedHL[n]}
         />
       ))}
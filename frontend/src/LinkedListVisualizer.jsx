@@ -2,7 +2,7 @@ import React from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import './index.css';
 
-export default function LinkedListVisualizer({ name, values, highlightIndex }) {
+export default function LinkedListVisualizer({ name, values, ids, highlightIndex }) {
   return (
     <div className="list-block">
       <h4>Linked List “{name}”</h4>
@@ -11,7 +11,7 @@ export default function LinkedListVisualizer({ name, values, highlightIndex }) {
           {values.map((val, i) => {
             const isHighlight = i === highlightIndex;
             return (
-              <React.Fragment key={`${name}-${i}-${val}`}>
+              <React.Fragment key={ids ? `${name}-${ids[i]}` : `${name}-${i}-${val}`}>
                 <motion.div
                   className="linked-cell"
                   initial={{ opacity: 0, x: -20 }}
@@ -0,0 +1,79 @@
+// heapView.js — rebuilds the `linked` / `trees` views from the shared heap
+//
+// The backend sends every object once as `heap[id] = record` (and again only
+// when it changes) and frames point at objects through `refs[name] = id`.
+// A decoder keeps the node table for one trace and turns each frame, in
+// order, back into what the visualizers draw. Node ids are stable for the
+// whole trace, so visualizers can key and animate by identity.
+
+const ref = v => (v && typeof v === 'object' && 'ref' in v ? v.ref : null);
+const isPrim = v => v === null || typeof v !== 'object';
+
+function linkedView(nodes, id) {
+  const values = [], ids = [], seen = new Set();
+  while (id != null && !seen.has(id)) {
+    seen.add(id);
+    const rec = nodes.get(id);
+    values.push(rec.val ?? null); ids.push(id);
+    id = ref(rec.next);
+  }
+  return { values, ids };
+}
+
+function treeView(nodes, id) {
+  if (id == null) return null;
+  const root = {}, seen = new Set(), stack = [[id, root]];
+  while (stack.length) {
+    const [nid, out] = stack.pop();
+    const rec = nodes.get(nid);
+    seen.add(nid);
+    out.id = nid;
+    for (const [k, v] of Object.entries(rec)) if (isPrim(v)) out[k] = v;
+    for (const side of ['left', 'right']) {
+      const child = ref(rec[side]);
+      if (child == null || seen.has(child)) out[side] = null;
+      else { out[side] = {}; stack.push([child, out[side]]); }
+    }
+  }
+  return root;
+}
+
+// lists / dicts of nodes (a BFS queue, a DFS stack) hold `{ ref: id }`:
+// draw the node's value there, or its id when it has none. Containers
+// without refs are returned as they are.
+function deref(nodes, v) {
+  if (isPrim(v)) return v;
+  const id = ref(v);
+  if (id != null) {
+    const val = nodes.get(id)?.val;
+    return val != null && isPrim(val) ? val : `#${id}`;
+  }
+  let out = v;
+  for (const [k, x] of Object.entries(v)) {
+    const y = deref(nodes, x);
+    if (y === x) continue;
+    if (out === v) out = Array.isArray(v) ? v.slice() : { ...v };
+    out[k] = y;
+  }
+  return out;
+}
+
+export function createHeapDecoder() {
+  const nodes = new Map();
+  return function decode(frame) {
+    for (const [id, rec] of Object.entries(frame.heap || {})) nodes.set(+id, rec);
+    const linked = {}, linkedIds = {}, trees = {};
+    for (const [name, id] of Object.entries(frame.refs || {})) {
+      const rec = nodes.get(id);
+      if (!rec) continue;
+      if ('next' in rec) {
+        const { values, ids } = linkedView(nodes, id);
+        linked[name] = values; linkedIds[name] = ids;
+      } else if ('left' in rec || 'right' in rec) {
+        trees[name] = treeView(nodes, id);
+      }
+    }
+    const lists = deref(nodes, frame.lists || {}), dicts = deref(nodes, frame.dicts || {});
+    return { ...frame, lists, dicts, linked, linkedIds, trees };
+  };
+}
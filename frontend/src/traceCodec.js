@@ -0,0 +1,86 @@
+// traceCodec.js — decodes the compact columnar `/trace` body
+//
+// With `format: "compact"` the backend sends the trace by column instead of
+// by frame (see backend/compact.py): line numbers as a base64 int32 array,
+// each distinct value once in `values`, and per variable a run-length
+// timeline of `[gap, valueIndex, …]` pairs (-1 = absent). `decodeCompactTrace`
+// turns that back into the frames the stream sends — `{ line_no, lists,
+// dicts, prims, refs, heap, array_indices }` — ready for the heap decoder.
+// Variables come out in the order they first appear in the trace.
+//
+// Frames share the interned value objects, so they must be treated as
+// read-only (the visualizers never mutate them).
+
+function int32s(b64) {
+  const bin = atob(b64);
+  const view = new DataView(Uint8Array.from(bin, c => c.charCodeAt(0)).buffer);
+  const out = new Int32Array(bin.length / 4);
+  for (let i = 0; i < out.length; i++) out[i] = view.getInt32(i * 4, true);
+  return out;
+}
+
+export function decodeCompactTrace(trace) {
+  if (trace.format !== 'columnar' || trace.version !== 1) {
+    throw new Error(`Unsupported trace format: ${trace.format} v${trace.version}`);
+  }
+  const lines = int32s(trace.line_no);
+  const frames = Array.from(lines, line_no => ({ line_no, heap: {} }));
+  const { values } = trace;
+
+  for (const [col, vars] of Object.entries(trace.columns)) {
+    for (const f of frames) f[col] = {};
+    for (const [name, runs] of Object.entries(vars)) {
+      let start = 0;
+      for (let r = 0; r < runs.length; r += 2) {
+        start += runs[r];
+        const vi = runs[r + 1];
+        const end = r + 2 < runs.length ? start + runs[r + 2] : frames.length;
+        if (vi < 0) continue;
+        for (let i = start; i < end; i++) frames[i][col][name] = values[vi];
+      }
+    }
+  }
+  for (const [i, heap] of trace.heap) frames[i].heap = heap;
+  return frames;
+}
+
+// ─── delta frames ───
+// A stream requested with `deltas: true` sends each list / dict local as the
+// ops since the previous frame instead of a full copy (see
+// backend/snapshots.py): `lists[name]` is a list of `['set', i, v]`,
+// `['ins', i, v]`, `['del', i]` or `['reset', value]`, empty when the
+// variable did not change. Every variable present in a frame is listed, and
+// a variable that goes out of scope keeps its state for when it comes back.
+
+function applyOps(prev, ops) {
+  if (!ops.length) return prev;
+  // copy on write: earlier frames keep pointing at `prev`
+  let state = Array.isArray(prev) ? prev.slice() : { ...prev };
+  for (const op of ops) {
+    switch (op[0]) {
+      case 'reset': state = op[1]; break;
+      case 'set':   state[op[1]] = op[2]; break;
+      case 'ins':   state.splice(op[1], 0, op[2]); break;
+      case 'del':
+        if (Array.isArray(state)) state.splice(op[1], 1);
+        else delete state[op[1]];
+        break;
+      default: throw new Error(`Unknown delta op: ${op[0]}`);
+    }
+  }
+  return state;
+}
+
+export function createDeltaDecoder() {
+  const state = { lists: {}, dicts: {} };
+  return function decode(frame) {
+    const out = { ...frame };
+    for (const col of ['lists', 'dicts']) {
+      out[col] = {};
+      for (const [name, ops] of Object.entries(frame[col] || {})) {
+        out[col][name] = state[col][name] = applyOps(state[col][name], ops);
+      }
+    }
+    return out;
+  };
+}